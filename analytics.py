@@ -0,0 +1,118 @@
+import math
+from array import array
+from bisect import bisect_right
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BAND_EDGES = (0, 60, 70, 80, 90, 100)
+BAND_LABELS = ("0-59", "60-69", "70-79", "80-89", "90-100")
+
+
+def _columns(students: List, subject_code: str):
+    values = array("d")
+    assignment_ids = array("l")
+    lengths = array("l")
+    assignments: Dict[str, int] = {}
+
+    for student in students:
+        book = student.gradebook(subject_code)
+        if not book:
+            continue
+        values.extend(book.values)
+        for name in book.names:
+            assignment_ids.append(assignments.setdefault(name, len(assignments)))
+        lengths.append(len(book))
+
+    return values, assignment_ids, lengths, list(assignments)
+
+
+def _numpy_stats(values, assignment_ids, lengths, names):
+    grades = np.frombuffer(values, dtype=np.float64)
+    ids = np.frombuffer(assignment_ids, dtype=np.dtype("l"))
+    counts = np.frombuffer(lengths, dtype=np.dtype("l"))
+
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    averages = np.add.reduceat(grades, offsets) / counts
+    assignment_sums = np.bincount(ids, weights=grades, minlength=len(names))
+    assignment_counts = np.bincount(ids, minlength=len(names))
+    histogram, _ = np.histogram(np.clip(grades, 0, 100), bins=BAND_EDGES)
+
+    return {
+        "subject_mean": float(averages.mean()),
+        "subject_median": float(np.median(averages)),
+        "subject_stdev": float(averages.std()),
+        "subject_min": float(averages.min()),
+        "subject_max": float(averages.max()),
+        "assignment_means": {
+            name: float(assignment_sums[i] / assignment_counts[i])
+            for i, name in enumerate(names)
+        },
+        "histogram": dict(zip(BAND_LABELS, (int(c) for c in histogram))),
+    }
+
+
+def _python_stats(values, assignment_ids, lengths, names):
+    averages = []
+    start = 0
+    for length in lengths:
+        averages.append(math.fsum(values[start : start + length]) / length)
+        start += length
+
+    assignment_sums = [0.0] * len(names)
+    assignment_counts = [0] * len(names)
+    histogram = [0] * len(BAND_LABELS)
+    last_band = len(BAND_LABELS) - 1
+    for grade, i in zip(values, assignment_ids):
+        assignment_sums[i] += grade
+        assignment_counts[i] += 1
+        band = bisect_right(BAND_EDGES, grade) - 1
+        histogram[min(max(band, 0), last_band)] += 1
+
+    averages.sort()
+    n = len(averages)
+    mean = math.fsum(averages) / n
+    middle = n // 2
+    if n % 2:
+        median = averages[middle]
+    else:
+        median = (averages[middle - 1] + averages[middle]) / 2
+    variance = math.fsum((a - mean) ** 2 for a in averages) / n
+
+    return {
+        "subject_mean": mean,
+        "subject_median": median,
+        "subject_stdev": math.sqrt(variance),
+        "subject_min": averages[0],
+        "subject_max": averages[-1],
+        "assignment_means": {
+            name: assignment_sums[i] / assignment_counts[i]
+            for i, name in enumerate(names)
+        },
+        "histogram": dict(zip(BAND_LABELS, histogram)),
+    }
+
+
+def subject_stats(students: List, subject_code: str) -> Dict:
+    values, assignment_ids, lengths, names = _columns(students, subject_code)
+
+    result = {
+        "subject_mean": None,
+        "subject_median": None,
+        "subject_stdev": None,
+        "subject_min": None,
+        "subject_max": None,
+        "assignment_means": {},
+        "histogram": dict.fromkeys(BAND_LABELS, 0),
+    }
+    if lengths:
+        compute = _numpy_stats if np is not None else _python_stats
+        result.update(compute(values, assignment_ids, lengths, names))
+
+    result["students_count"] = len(students)
+    result["graded_count"] = len(lengths)
+    result["grades_count"] = len(values)
+    return result
@@ -0,0 +1,157 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import metrics
+import storage
+from bench import generate, scenarios
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench", description="Saqlash va tahlil benchmarklari"
+    )
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--subjects", type=int, default=500)
+    parser.add_argument("--grades", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Har bir ssenariy necha marta"
+    )
+    parser.add_argument(
+        "--ops", type=int, default=10, help="Bir o'lchovdagi amallar soni"
+    )
+    parser.add_argument(
+        "--backend", choices=["json", "sqlite", "sharded"], default="json"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "binary"],
+        default="json",
+        help="json backend uchun data.json formati",
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(scenarios.SCENARIOS),
+        help="Vergul bilan ajratilgan ssenariylar",
+    )
+    parser.add_argument("--out", help="Natija JSON fayli (standart: stdout)")
+    return parser
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(func, ctx, repeat: int):
+    timings = []
+    ops = 0
+    metrics.reset()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = func(ctx)
+        timings.append(time.perf_counter() - start)
+
+    counters = metrics.counters()
+    runs = len(timings) * ops
+    median = statistics.median(timings)
+    return {
+        "runs": len(timings),
+        "ops": ops,
+        "min": min(timings),
+        "median": median,
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+        "ops_per_sec": ops / median if median else None,
+        "bytes_read_per_op": counters.get("storage.bytes_read", 0) / runs,
+        "bytes_written_per_op": counters.get("storage.bytes_written", 0) / runs,
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in scenarios.SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Noma'lum ssenariy: {', '.join(unknown)}")
+
+    out = os.path.abspath(args.out) if args.out else None
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="edu-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            output = run(args, names)
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(output, indent=2)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def run(args, names):
+    os.makedirs("reports")
+    start = time.perf_counter()
+    counts = generate.generate(
+        storage.DATA_FILE,
+        students=args.students,
+        subjects=args.subjects,
+        grades=args.grades,
+        seed=args.seed,
+    )
+    generate_seconds = time.perf_counter() - start
+    if args.format != "json":
+        storage.convert(args.format)
+    if args.backend != "json":
+        storage.migrate(args.backend)
+        storage.STORAGE_BACKEND = args.backend
+
+    ctx = scenarios.Context(args.seed, args.ops, "reports")
+    results = {}
+    for name in names:
+        results[name] = run_scenario(scenarios.SCENARIOS[name], ctx, args.repeat)
+        print(f"{name}: {results[name]['median'] * 1000:.1f} ms", file=sys.stderr)
+
+    output = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "backend": args.backend,
+            "format": args.format,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "ops": args.ops,
+            "dataset": dict(counts, bytes=os.path.getsize(storage.DATA_FILE)),
+            "generate_seconds": generate_seconds,
+        },
+        "results": results,
+    }
+    storage.get_backend().close()
+    return output
+
+
+if __name__ == "__main__":
+    main()
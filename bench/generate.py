@@ -0,0 +1,101 @@
+import datetime
+import math
+import random
+from typing import Dict, Any
+
+import storage
+from models import AttendanceDays
+
+TERM_START = datetime.date(2024, 9, 2)
+TERM_DAYS = 90
+
+
+def build(
+    students: int = 10_000,
+    subjects: int = 500,
+    grades: int = 1_000_000,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    teachers = max(1, subjects // 5)
+    per_student = max(1, grades // max(1, students))
+    per_subject = min(subjects, max(1, round(math.sqrt(per_student))))
+    per_assignment = max(1, math.ceil(per_student / per_subject))
+    days = [
+        (TERM_START + datetime.timedelta(days=i)).isoformat() for i in range(TERM_DAYS)
+    ]
+
+    subject_recs = [
+        {
+            "name": f"Fan {i}",
+            "code": f"S{i:04d}",
+            "teacher": f"teacher{i % teachers}",
+            "students": [],
+            "grade_total": [0.0, 0],
+        }
+        for i in range(subjects)
+    ]
+    users = [{"username": "admin", "password": "admin", "role": "Admin"}]
+    for t in range(teachers):
+        users.append(
+            {
+                "username": f"teacher{t}",
+                "password": "p",
+                "role": "Teacher",
+                "subjects": [s["code"] for s in subject_recs[t::teachers]],
+            }
+        )
+
+    remaining = grades
+    for i in range(students):
+        username = f"student{i:06d}"
+        quota = min(per_student, remaining) if i < students - 1 else remaining
+        remaining -= quota
+
+        student_grades, totals, attendance = {}, {}, {}
+        for subject in rng.sample(subject_recs, per_subject):
+            code = subject["code"]
+            subject["students"].append(username)
+            attendance[code] = AttendanceDays(rng.sample(days, 20)).to_dict()
+            count = min(per_assignment, quota)
+            if not count:
+                continue
+            quota -= count
+            book = {f"hw{k}": float(rng.randint(40, 100)) for k in range(count)}
+            student_grades[code] = book
+            total = sum(book.values())
+            totals[code] = [total, count]
+            subject["grade_total"][0] += total
+            subject["grade_total"][1] += count
+
+        users.append(
+            {
+                "username": username,
+                "password": "p",
+                "role": "Student",
+                "grades": student_grades,
+                "attendance": attendance,
+                "grade_totals": totals,
+                "grade_total": [
+                    sum(t[0] for t in totals.values()),
+                    sum(t[1] for t in totals.values()),
+                ],
+            }
+        )
+
+    return {"users": users, "subjects": subject_recs}
+
+
+def write(path: str, data: Dict[str, Any]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(storage._snapshot_text(data))
+
+
+def generate(path: str, **params) -> Dict[str, int]:
+    data = build(**params)
+    write(path, data)
+    return {
+        "users": len(data["users"]),
+        "subjects": len(data["subjects"]),
+        "grades": sum(s["grade_total"][1] for s in data["subjects"]),
+    }
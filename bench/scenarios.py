@@ -0,0 +1,140 @@
+import os
+import random
+from typing import List
+
+import reports
+import storage
+from models import Student, Teacher
+
+
+class Context:
+    def __init__(self, seed: int, ops: int, out_dir: str):
+        self.rng = random.Random(seed)
+        self.ops = ops
+        self.out_dir = out_dir
+        self.added = 0
+        data = storage.load_data()
+        self.students = [
+            u["username"] for u in data["users"] if u.get("role") == "Student"
+        ]
+        self.subjects = [s["code"] for s in data["subjects"]]
+
+    def pick_students(self, count: int) -> List[str]:
+        return [self.rng.choice(self.students) for _ in range(count)]
+
+    def pick_subjects(self, count: int) -> List[str]:
+        return [self.rng.choice(self.subjects) for _ in range(count)]
+
+    def enrolled(self, code: str) -> List[Student]:
+        records = (storage.find_user(u) for u in storage.find_subject(code)["students"])
+        return [
+            storage.instantiate_user_from_record(
+                rec, subjects=[code], fields=("grades",)
+            )
+            for rec in records
+            if rec
+        ]
+
+
+def load_cold(ctx: Context) -> int:
+    storage.invalidate_cache()
+    storage.load_data()
+    return 1
+
+
+def find_user(ctx: Context) -> int:
+    names = ctx.pick_students(ctx.ops * 100)
+    for name in names:
+        storage.find_user(name)
+    return len(names)
+
+
+def add_user(ctx: Context) -> int:
+    for _ in range(ctx.ops):
+        ctx.added += 1
+        storage.add_user(Student(f"bench{ctx.added:06d}", "p"))
+    return ctx.ops
+
+
+def set_grade(ctx: Context) -> int:
+    for name in ctx.pick_students(ctx.ops):
+        codes = list(storage.find_user(name).get("grades") or ctx.subjects[:1])
+        code = ctx.rng.choice(codes)
+        storage.set_grade(name, code, "bench", float(ctx.rng.randint(40, 100)))
+    return ctx.ops
+
+
+def update_grades(ctx: Context) -> int:
+    for name in ctx.pick_students(ctx.ops):
+        student = storage.instantiate_user_from_record(storage.find_user(name))
+        for code in list(student.grades):
+            student.add_grade(code, "bench_bulk", float(ctx.rng.randint(40, 100)))
+        storage.update_user(name, {"grades": student._grades})
+    return ctx.ops
+
+
+def roll_call(ctx: Context) -> int:
+    for code in ctx.pick_subjects(ctx.ops):
+        enrolled = storage.find_subject(code)["students"]
+        present = [u for u in enrolled if ctx.rng.random() < 0.9]
+        absent = [u for u in enrolled if u not in set(present)]
+        date = f"2025-01-{ctx.rng.randint(1, 28):02d}"
+        storage.roll_call(code, date, present, absent)
+    return ctx.ops
+
+
+def update_attendance(ctx: Context) -> int:
+    for name in ctx.pick_students(ctx.ops):
+        student = storage.instantiate_user_from_record(storage.find_user(name))
+        for code in list(student.attendance):
+            student.add_attendance(code, f"2025-02-{ctx.rng.randint(1, 28):02d}")
+        storage.update_user(name, {"attendance": student._attendance})
+    return ctx.ops
+
+
+def analyze_subject(ctx: Context) -> int:
+    teacher = Teacher("bench", "p")
+    for code in ctx.pick_subjects(ctx.ops):
+        teacher.analyze_subject(ctx.enrolled(code), code)
+    return ctx.ops
+
+
+def overall_average(ctx: Context) -> int:
+    names = ctx.pick_students(ctx.ops * 100)
+    for name in names:
+        storage.instantiate_user_from_record(storage.find_user(name)).overall_average
+    return len(names)
+
+
+def student_reports(ctx: Context) -> int:
+    names = {s["code"]: s["name"] for s in storage.list_subjects()}
+    for name in ctx.pick_students(ctx.ops * 10):
+        student = storage.instantiate_user_from_record(storage.find_user(name))
+        path = os.path.join(ctx.out_dir, reports.student_report_name(name))
+        reports.write_report(path, reports.render_student_report(student, names))
+    return ctx.ops * 10
+
+
+def subject_reports(ctx: Context) -> int:
+    teacher = Teacher("bench", "p")
+    for code in ctx.pick_subjects(ctx.ops):
+        result = teacher.analyze_subject(ctx.enrolled(code), code)
+        path = os.path.join(ctx.out_dir, reports.subject_report_name(code))
+        text = reports.render_subject_report(storage.find_subject(code), result)
+        reports.write_report(path, text)
+    return ctx.ops
+
+
+SCENARIOS = {
+    "load_cold": load_cold,
+    "find_user": find_user,
+    "add_user": add_user,
+    "set_grade": set_grade,
+    "update_grades": update_grades,
+    "roll_call": roll_call,
+    "update_attendance": update_attendance,
+    "analyze_subject": analyze_subject,
+    "overall_average": overall_average,
+    "student_reports": student_reports,
+    "subject_reports": subject_reports,
+}
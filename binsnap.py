@@ -0,0 +1,187 @@
+import json
+import mmap
+import struct
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+MAGIC = b"EDUB"
+FORMAT_VERSION = 1
+SECTIONS = (("users", "username"), ("subjects", "code"))
+
+# magic, version, flags, user count, subject count, extra length, keys length,
+# users array length, subjects array length
+HEADER = struct.Struct("<4sHHIIIIQQ")
+# record offset, record length, key offset (inside the key blob), key length
+ENTRY = struct.Struct("<QIIH")
+SLOT = struct.Struct("<I")
+
+_SEPARATORS = (",", ":")
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, separators=_SEPARATORS, ensure_ascii=False).encode()
+
+
+def dumps(data: Dict[str, Any]) -> bytes:
+    extra = {
+        key: value
+        for key, value in data.items()
+        if key not in ("users", "subjects", "meta")
+    }
+    extra_bytes = _encode(extra)
+
+    sections = []
+    for name, field in SECTIONS:
+        records = data.get(name, [])
+        keys = [str(rec[field]).encode() for rec in records]
+        bodies = [_encode(rec) for rec in records]
+        sections.append((keys, bodies))
+
+    tables_size = sum(len(keys) * (ENTRY.size + SLOT.size) for keys, _ in sections)
+    keys_blob = b"".join(key for keys, _ in sections for key in keys)
+    pos = HEADER.size + len(extra_bytes) + tables_size + len(keys_blob)
+
+    tables, arrays = [], []
+    key_pos = 0
+    for keys, bodies in sections:
+        # each section is stored as one JSON array, so a full load is a
+        # single json.loads and a single record is a slice of it
+        array = b"[" + b",".join(bodies) + b"]"
+        offset = pos + 1
+        entries = []
+        for key, body in zip(keys, bodies):
+            entries.append(ENTRY.pack(offset, len(body), key_pos, len(key)))
+            offset += len(body) + 1
+            key_pos += len(key)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        tables.append(b"".join(entries))
+        tables.append(b"".join(SLOT.pack(i) for i in order))
+        arrays.append(array)
+        pos += len(array)
+
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        0,
+        len(sections[0][0]),
+        len(sections[1][0]),
+        len(extra_bytes),
+        len(keys_blob),
+        len(arrays[0]),
+        len(arrays[1]),
+    )
+    return b"".join([header, extra_bytes, *tables, keys_blob, *arrays])
+
+
+class Snapshot:
+    def __init__(self, buf):
+        if len(buf) < HEADER.size or buf[:4] != MAGIC:
+            raise ValueError("Binar snapshot emas")
+        fields = HEADER.unpack_from(buf, 0)
+        if fields[1] != FORMAT_VERSION:
+            raise ValueError(f"Noma'lum binar format versiyasi: {fields[1]}")
+        self.buf = buf
+        self.counts = {"users": fields[3], "subjects": fields[4]}
+        self._extra = (HEADER.size, HEADER.size + fields[5])
+
+        pos = self._extra[1]
+        self._entries, self._order = {}, {}
+        for name, _ in SECTIONS:
+            n = self.counts[name]
+            self._entries[name] = pos
+            self._order[name] = pos + n * ENTRY.size
+            pos += n * (ENTRY.size + SLOT.size)
+        self._keys = pos
+        pos += fields[6]
+        self._arrays = {}
+        for (name, _), size in zip(SECTIONS, fields[7:]):
+            self._arrays[name] = (pos, pos + size)
+            pos += size
+        if pos > len(buf):
+            raise ValueError("Binar snapshot kesilgan")
+
+    def extra(self) -> Dict[str, Any]:
+        start, end = self._extra
+        return json.loads(self.buf[start:end])
+
+    def section(self, name: str):
+        start, end = self._arrays[name]
+        return json.loads(self.buf[start:end])
+
+    def _entry(self, name: str, i: int):
+        return ENTRY.unpack_from(self.buf, self._entries[name] + i * ENTRY.size)
+
+    def _key(self, name: str, i: int) -> bytes:
+        _, _, key_offset, key_len = self._entry(name, i)
+        start = self._keys + key_offset
+        return self.buf[start : start + key_len]
+
+    def record(self, name: str, i: int) -> Dict[str, Any]:
+        offset, length, _, _ = self._entry(name, i)
+        return json.loads(self.buf[offset : offset + length])
+
+    def records(self, name: str) -> Iterator[Dict[str, Any]]:
+        for i in range(self.counts[name]):
+            yield self.record(name, i)
+
+    def find(self, name: str, key: str) -> Optional[Dict[str, Any]]:
+        order = self._order[name]
+        lo, hi = 0, self.counts[name]
+        target = key.encode()
+        # leftmost match, so duplicates resolve to the first record like
+        # the in-memory index does
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (i,) = SLOT.unpack_from(self.buf, order + mid * SLOT.size)
+            if self._key(name, i) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.counts[name]:
+            return None
+        (i,) = SLOT.unpack_from(self.buf, order + lo * SLOT.size)
+        if self._key(name, i) != target:
+            return None
+        return self.record(name, i)
+
+
+def loads(buf) -> Dict[str, Any]:
+    snap = Snapshot(buf)
+    data = snap.extra()
+    for name, _ in SECTIONS:
+        data[name] = snap.section(name)
+    return data
+
+
+def is_binary(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def read_header(path: str) -> Optional[Dict[str, int]]:
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size or raw[:4] != MAGIC:
+        return None
+    fields = HEADER.unpack(raw)
+    return {"users": fields[3], "subjects": fields[4]}
+
+
+@contextmanager
+def open_snapshot(path: str):
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield Snapshot(buf)
+
+
+def iter_section(path: str, name: str) -> Iterator[Dict[str, Any]]:
+    with open_snapshot(path) as snap:
+        yield from snap.records(name)
+
+
+def find(path: str, name: str, key: str) -> Optional[Dict[str, Any]]:
+    with open_snapshot(path) as snap:
+        return snap.find(name, key)
@@ -0,0 +1,188 @@
+import csv
+import math
+from typing import Dict, List, Tuple
+
+import storage
+
+GRADE_HEADERS = ("student", "talaba", "username")
+PAIR_HEADERS = ("subject", "fan", "code")
+ROLE_LABELS = {"Student": "talaba", "Teacher": "o'qituvchi"}
+
+
+def _read_rows(path: str, headers=GRADE_HEADERS):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line_no, row in enumerate(csv.reader(f), start=1):
+            if line_no == 1 and row and row[0].strip().lower() in headers:
+                continue
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            yield line_no, row
+
+
+def import_grades(subject_code: str, path: str) -> Dict:
+    subject = storage.find_subject(subject_code)
+    if not subject:
+        raise ValueError(f"Fan topilmadi: {subject_code}")
+
+    enrolled = set(subject.get("students", []))
+    known: Dict[str, bool] = {}
+    errors: List[Tuple[int, str]] = []
+    grades: Dict[str, Dict[str, float]] = {}
+    rows = 0
+
+    for line_no, row in _read_rows(path):
+        rows += 1
+        if len(row) != 3:
+            errors.append((line_no, f"3 ta ustun kutilgan, {len(row)} ta bor"))
+            continue
+
+        student, assignment, raw_grade = (cell.strip() for cell in row)
+        if student not in enrolled:
+            errors.append((line_no, f"{student}: bu fanga yozilmagan"))
+            continue
+        if student not in known:
+            rec = storage.find_user(student)
+            known[student] = bool(rec) and rec.get("role") == "Student"
+        if not known[student]:
+            errors.append((line_no, f"{student}: talaba topilmadi"))
+            continue
+        if not assignment:
+            errors.append((line_no, "Vazifa nomi bo'sh"))
+            continue
+        try:
+            grade = float(raw_grade)
+        except ValueError:
+            errors.append((line_no, f"Noto'g'ri baho: {raw_grade!r}"))
+            continue
+        if math.isnan(grade) or not 0 <= grade <= 100:
+            errors.append((line_no, f"Baho 0-100 oralig'ida emas: {raw_grade}"))
+            continue
+
+        grades.setdefault(student, {})[assignment] = grade
+
+    applied = 0
+    with storage.transaction():
+        for student, assignments in grades.items():
+            for assignment, grade in assignments.items():
+                storage.set_grade(student, subject_code, assignment, grade)
+                applied += 1
+
+    return {
+        "rows": rows,
+        "applied": applied,
+        "students": len(grades),
+        "errors": errors,
+    }
+
+
+def _roster_rows(path: str):
+    for line_no, row in _read_rows(path, PAIR_HEADERS):
+        if len(row) != 2:
+            yield line_no, None, None
+            continue
+        yield line_no, row[0].strip().upper(), row[1].strip()
+
+
+def _numbered(pairs):
+    for item, (code, username) in enumerate(pairs, start=1):
+        yield item, code, username
+
+
+def _resolve(rows, role: str):
+    subjects: Dict[str, Dict] = {}
+    users: Dict[str, bool] = {}
+    grouped: Dict[str, Dict[str, None]] = {}
+    errors: List[Tuple[int, str]] = []
+    total = 0
+
+    for item, code, username in rows:
+        total += 1
+
+        if not code or not username:
+            errors.append((item, "2 ta ustun kutilgan: fan,user"))
+            continue
+        if code not in subjects:
+            subjects[code] = storage.find_subject(code)
+        if not subjects[code]:
+            errors.append((item, f"[{code}]: fan topilmadi"))
+            continue
+        if username not in users:
+            rec = storage.find_user(username)
+            users[username] = bool(rec) and rec.get("role") == role
+        if not users[username]:
+            errors.append((item, f"{username}: {ROLE_LABELS[role]} topilmadi"))
+            continue
+        grouped.setdefault(code, {})[username] = None
+
+    return subjects, grouped, errors, total
+
+
+def _enroll(rows) -> Dict:
+    subjects, grouped, errors, total = _resolve(rows, "Student")
+
+    enrolled = skipped = 0
+    with storage.transaction():
+        for code, usernames in grouped.items():
+            present = set(subjects[code].get("students", []))
+            new = [u for u in usernames if u not in present]
+            skipped += len(usernames) - len(new)
+            if new:
+                storage.enroll(code, new)
+                enrolled += len(new)
+
+    return {
+        "pairs": total,
+        "enrolled": enrolled,
+        "skipped": skipped,
+        "subjects": len(grouped),
+        "errors": errors,
+    }
+
+
+def _assign(rows) -> Dict:
+    subjects, grouped, errors, total = _resolve(rows, "Teacher")
+
+    codes_by_teacher: Dict[str, List[str]] = {}
+    with storage.transaction():
+        for code, teachers in grouped.items():
+            teacher = list(teachers)[-1]
+            if subjects[code].get("teacher") != teacher:
+                storage.update_subject(code, {"teacher": teacher})
+            codes_by_teacher.setdefault(teacher, []).append(code)
+
+        for teacher, codes in codes_by_teacher.items():
+            current = storage.find_user(teacher).get("subjects", [])
+            present = set(current)
+            new = [c for c in codes if c not in present]
+            if new:
+                storage.update_user(teacher, {"subjects": current + new})
+
+    return {
+        "pairs": total,
+        "assigned": len(grouped),
+        "teachers": len(codes_by_teacher),
+        "errors": errors,
+    }
+
+
+def enroll_students(pairs) -> Dict:
+    return _enroll(_numbered(pairs))
+
+
+def enroll_roster(path: str) -> Dict:
+    return _enroll(_roster_rows(path))
+
+
+def assign_teachers(pairs) -> Dict:
+    return _assign(_numbered(pairs))
+
+
+def assign_roster(path: str) -> Dict:
+    return _assign(_roster_rows(path))
+
+
+def write_error_report(errors: List[Tuple[int, str]], path: str):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Qator", "Xato"])
+        writer.writerows(errors)
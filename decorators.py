@@ -1,15 +1,125 @@
 import logging
+import time
+import metrics
 import session
 
+CO_COROUTINE = 0x80  # inspect.CO_COROUTINE; inspect itself is slow to import
+
 logger = logging.getLogger("educational")
 
 
+def _is_async(func) -> bool:
+    code = getattr(func, "__code__", None)
+    return code is not None and bool(code.co_flags & CO_COROUTINE)
+
+
+def _fields(user, action: str, outcome: str, duration: float = None):
+    return {
+        "user": user.username if user else None,
+        "action": action,
+        "role": user.role if user else None,
+        "duration": duration,
+        "outcome": outcome,
+    }
+
+
+# the entry line is the audit trail for calls that run for a long time (an
+# interactive menu) or never return; the closing line carries the duration
+def _log_start(user, action: str):
+    logger.info(
+        "%s - %s boshlandi",
+        user.username if user else "anonim",
+        action,
+        extra=_fields(user, action, "start"),
+    )
+
+
+def _log_call(user, action: str, start: float, outcome: str):
+    duration = (time.perf_counter() - start) * 1000
+    logger.info(
+        "%s - %s %.1fms %s",
+        user.username if user else "anonim",
+        action,
+        duration,
+        outcome,
+        extra=_fields(user, action, outcome, round(duration, 3)),
+    )
+
+
 def log_action(func):
+    if _is_async(func):
+
+        async def async_wrapper(*args, **kwargs):
+            user = session.get_user()
+            _log_start(user, func.__name__)
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                return await func(*args, **kwargs)
+            except BaseException as e:
+                outcome = type(e).__name__
+                raise
+            finally:
+                _log_call(user, func.__name__, start, outcome)
+
+        return async_wrapper
+
+    def wrapper(*args, **kwargs):
+        user = session.get_user()
+        _log_start(user, func.__name__)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            _log_call(user, func.__name__, start, outcome)
+
+    return wrapper
+
+
+def timed(func):
+    action = func.__name__
+
+    if _is_async(func):
+
+        async def async_wrapper(*args, **kwargs):
+            before = metrics.io_snapshot()
+            wall, cpu = time.perf_counter(), time.thread_time()
+            ok = False
+            try:
+                result = await func(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                metrics.record(
+                    action,
+                    time.perf_counter() - wall,
+                    time.thread_time() - cpu,
+                    before,
+                    ok,
+                )
+
+        return async_wrapper
+
     def wrapper(*args, **kwargs):
-        user = getattr(session, "current_user")
-        username = user.username if user else "anonim"
-        logger.info(f"{username} - {func.__name__}")
-        return func(*args, **kwargs)
+        before = metrics.io_snapshot()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            metrics.record(
+                action,
+                time.perf_counter() - wall,
+                time.thread_time() - cpu,
+                before,
+                ok,
+            )
 
     return wrapper
 
@@ -17,7 +127,7 @@ def log_action(func):
 def require_role(*allowed_roles):
     def decorator(func):
         def wrapper(*args, **kwargs):
-            user = getattr(session, "current_user")
+            user = session.get_user()
             if not user:
                 raise PermissionError("Tizimga kirish talab qilinadi")
             user_role = user.role.lower()
@@ -0,0 +1,293 @@
+import json
+import logging
+import os
+from typing import Dict, Any, List, Optional
+
+LOG_FILE = "data.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+INDEX_SUFFIX = ".idx"
+READ_BLOCK = 64 * 1024
+INDEX_BLOCK = 256 * 1024
+HEAD_BYTES = 64
+PAGE_SIZE = 20
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+STRUCTURED_FIELDS = ("user", "action", "role", "duration", "outcome")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["error"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _parse_json(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or "message" not in entry:
+        return None
+    if "user" not in entry or "action" not in entry:
+        user, sep, action = entry["message"].partition(" - ")
+        if not sep:
+            return None
+        entry.setdefault("user", user)
+        entry.setdefault("action", action.split(" ", 1)[0])
+    return entry
+
+
+def parse_entry(line: str) -> Optional[Dict[str, Any]]:
+    if line.startswith("{"):
+        return _parse_json(line)
+    parts = line.rstrip("\n").split(" | ", 2)
+    if len(parts) != 3:
+        return None
+    asctime, level, message = parts
+    user, sep, action = message.partition(" - ")
+    if not sep:
+        return None
+    return {
+        "time": asctime,
+        "level": level,
+        "user": user,
+        "action": action.split(" ", 1)[0],
+        "message": message,
+    }
+
+
+def display_line(line: str) -> str:
+    if not line.startswith("{"):
+        return line
+    entry = _parse_json(line)
+    if entry is None:
+        return line
+    return f"{entry.get('time')} | {entry.get('level')} | {entry['message']}"
+
+
+def segment_paths(path: str = LOG_FILE) -> List[str]:
+    backups = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        backups.append(f"{path}.{i}")
+        i += 1
+    paths = backups[::-1]
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+
+class _Segment:
+    __slots__ = ("path", "file", "size", "start", "key", "head")
+
+    def __init__(self, path: str, start: int):
+        import hashlib
+
+        self.path = path
+        self.file = open(path, "rb")
+        st = os.fstat(self.file.fileno())
+        self.size = st.st_size
+        self.start = start
+        self.key = f"{st.st_dev}:{st.st_ino}"
+        self.head = hashlib.sha1(self.file.read(HEAD_BYTES)).hexdigest()[:16]
+
+    def read(self, offset: int, size: int) -> bytes:
+        self.file.seek(offset)
+        return self.file.read(size)
+
+
+class LogView:
+    def __init__(self, path: str = LOG_FILE):
+        self.path = path
+        self.segments: List[_Segment] = []
+        start = 0
+        for seg_path in segment_paths(path):
+            try:
+                seg = _Segment(seg_path, start)
+            except FileNotFoundError:
+                continue  # rotated away between listing and opening
+            self.segments.append(seg)
+            start += seg.size
+        self.size = start
+        self._blocks: Optional[List] = None
+
+    def close(self):
+        for seg in self.segments:
+            seg.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read(self, start: int, end: int) -> bytes:
+        chunks = []
+        for seg in self.segments:
+            lo = max(start, seg.start)
+            hi = min(end, seg.start + seg.size)
+            if lo < hi:
+                chunks.append(seg.read(lo - seg.start, hi - lo))
+        return b"".join(chunks)
+
+    def _lines(self, start: int, data: bytes):
+        offset = start
+        for raw in data.splitlines(keepends=True):
+            yield offset, raw.decode("utf-8", "replace").rstrip("\r\n")
+            offset += len(raw)
+
+    def _decode(self, raw: List[bytes]) -> List[str]:
+        lines = (r.decode("utf-8", "replace").rstrip("\r\n") for r in raw)
+        return [line for line in lines if line]
+
+    def page_before(self, end: int = None, count: int = 20):
+        end = self.size if end is None else min(end, self.size)
+        start = end
+        data = b""
+        while start > 0 and data.count(b"\n") <= count:
+            new_start = max(0, start - READ_BLOCK)
+            data = self._read(new_start, start) + data
+            start = new_start
+
+        raw = data.splitlines(keepends=True)[-count:]
+        return self._decode(raw), end - sum(len(r) for r in raw)
+
+    def page_after(self, start: int = 0, count: int = 20):
+        end = start
+        data = b""
+        while end < self.size and data.count(b"\n") < count:
+            new_end = min(self.size, end + READ_BLOCK)
+            data += self._read(end, new_end)
+            end = new_end
+
+        raw = data.splitlines(keepends=True)[:count]
+        return self._decode(raw), start + sum(len(r) for r in raw)
+
+    def tail(self, count: int = 20) -> List[str]:
+        return self.page_before(self.size, count)[0]
+
+    def _index_path(self) -> str:
+        return self.path + INDEX_SUFFIX
+
+    def _load_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        blocks: Dict[str, List[Dict[str, Any]]] = {}
+        try:
+            f = open(self._index_path(), "r", encoding="utf-8")
+        except FileNotFoundError:
+            return blocks
+        with f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn tail from an interrupted append
+                blocks.setdefault(rec["seg"], []).append(rec)
+        return blocks
+
+    def _index_segment(self, seg: _Segment, offset: int):
+        records = []
+        while offset < seg.size:
+            data = seg.read(offset, min(INDEX_BLOCK, seg.size - offset))
+            cut = data.rfind(b"\n")
+            if cut < 0:
+                if offset + len(data) < seg.size:
+                    cut = len(data) - 1  # single oversized line
+                else:
+                    break  # trailing partial line, index it next time
+            data = data[: cut + 1]
+            users, actions = set(), set()
+            for raw in data.splitlines():
+                entry = parse_entry(raw.decode("utf-8", "replace"))
+                if entry:
+                    users.add(entry["user"])
+                    actions.add(entry["action"])
+            records.append(
+                {
+                    "seg": seg.key,
+                    "head": seg.head,
+                    "start": offset,
+                    "end": offset + len(data),
+                    "users": sorted(users),
+                    "actions": sorted(actions),
+                }
+            )
+            offset += len(data)
+        return records
+
+    def build_index(self) -> List:
+        if self._blocks is not None:
+            return self._blocks
+
+        stored = self._load_index()
+        live = {seg.key for seg in self.segments}
+        rewrite = any(key not in live for key in stored)
+        blocks, new = [], []
+        for seg in self.segments:
+            kept = [
+                rec
+                for rec in stored.get(seg.key, [])
+                if rec.get("head") == seg.head and rec["end"] <= seg.size
+            ]
+            if len(kept) != len(stored.get(seg.key, [])):
+                rewrite = True
+            covered = kept[-1]["end"] if kept else 0
+            added = self._index_segment(seg, covered)
+            new.extend(added)
+            for rec in kept + added:
+                blocks.append((seg, rec))
+
+        if rewrite:
+            with open(self._index_path(), "w", encoding="utf-8") as f:
+                for _, rec in blocks:
+                    f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        elif new:
+            with open(self._index_path(), "a", encoding="utf-8") as f:
+                for rec in new:
+                    f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+
+        self._blocks = blocks
+        return blocks
+
+    def search(
+        self,
+        user: str = None,
+        action: str = None,
+        before: int = None,
+        count: int = 20,
+    ):
+        before = self.size if before is None else before
+        found = []
+        for seg, rec in reversed(self.build_index()):
+            start = seg.start + rec["start"]
+            if start >= before:
+                continue
+            if user and user not in rec["users"]:
+                continue
+            if action and action not in rec["actions"]:
+                continue
+            end = min(seg.start + rec["end"], before)
+            matches = []
+            for offset, line in self._lines(start, self._read(start, end)):
+                entry = parse_entry(line)
+                if not entry:
+                    continue
+                if user and entry["user"] != user:
+                    continue
+                if action and entry["action"] != action:
+                    continue
+                matches.append((offset, line))
+            found[:0] = matches[-(count - len(found)) :]
+            if len(found) >= count:
+                break
+        position = found[0][0] if found else 0
+        return [line for _, line in found], position
@@ -1,19 +1,261 @@
+import argparse
+import atexit
 import logging
-from ui import run_cli
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
+STARTED = time.perf_counter()
+STARTUP_BUDGET_MS = 100
+LOG_JSON = os.environ.get("EDU_LOG_JSON", "") == "1"
 
-def configure_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(message)s",
-        handlers=[logging.FileHandler("data.log")],
+
+class LazyQueueHandler(QueueHandler):
+    def prepare(self, record):
+        if record.exc_info:
+            return super().prepare(record)
+        return record
+
+
+def configure_logging(structured: bool = LOG_JSON):
+    from logview import LOG_BACKUPS, LOG_FILE, LOG_MAX_BYTES, TEXT_FORMAT
+
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUPS,
+        encoding="utf-8",
+        delay=True,
     )
+    if structured:
+        from logview import JsonFormatter
+
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logging.basicConfig(level=logging.INFO, handlers=[LazyQueueHandler(records)])
     return logging.getLogger("educational")
 
 
+def build_parser():
+    parser = argparse.ArgumentParser(description="Ta'lim tizimi")
+    commands = parser.add_subparsers(dest="command")
+
+    migrate = commands.add_parser(
+        "migrate", help="data.json ma'lumotlarini boshqa saqlash turiga ko'chirish"
+    )
+    migrate.add_argument("target", choices=["sqlite", "sharded"])
+    migrate.add_argument(
+        "--path", help="Manzil (standart: data.db yoki data/ katalogi)"
+    )
+
+    verify = commands.add_parser(
+        "verify-aggregates",
+        help="Saqlangan o'rtacha yig'indilarni baholardan qayta hisoblab tekshirish",
+    )
+    verify.add_argument(
+        "--fix", action="store_true", help="Topilgan farqlarni tuzatib yozish"
+    )
+
+    grades = commands.add_parser(
+        "import-grades", help="Fan baholarini CSV fayldan ommaviy yuklash"
+    )
+    grades.add_argument("subject", help="Fan kodi")
+    grades.add_argument("file", help="CSV: talaba,vazifa,baho")
+
+    enroll = commands.add_parser(
+        "enroll", help="Talabalarni fanlarga CSV ro'yxatdan ommaviy yozish"
+    )
+    enroll.add_argument("file", help="CSV: fan,talaba")
+
+    assign = commands.add_parser(
+        "assign-teachers", help="O'qituvchilarni fanlarga CSV ro'yxatdan tayinlash"
+    )
+    assign.add_argument("file", help="CSV: fan,o'qituvchi")
+
+    export = commands.add_parser(
+        "export-reports",
+        help="Barcha talaba va fan hisobotlarini parallel eksport qilish",
+    )
+    export.add_argument("--out", default=".", help="Katalog (standart: joriy)")
+    export.add_argument(
+        "--workers", type=int, help="Jarayonlar soni (standart: barcha yadrolar)"
+    )
+    export.add_argument(
+        "--force", action="store_true", help="O'zgarmaganlarini ham qayta yozish"
+    )
+
+    serve = commands.add_parser(
+        "serve", help="Ko'p foydalanuvchili server rejimi (JSON qatorlar protokoli)"
+    )
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+
+    term = commands.add_parser(
+        "close-term",
+        help="Joriy semestr baho va davomatini arxiv segmentiga ko'chirish",
+    )
+    term.add_argument("name", help="Semestr nomi, masalan 2024-kuz")
+
+    convert = commands.add_parser(
+        "convert", help="Ma'lumotlar faylini JSON yoki binar formatga o'tkazish"
+    )
+    convert.add_argument("format", choices=["json", "binary"])
+    convert.add_argument(
+        "--out", help="Boshqa faylga yozish (standart: data.json o'rnida)"
+    )
+
+    startup = commands.add_parser(
+        "startup-report", help="Ishga tushish bosqichlari vaqtini o'lchash"
+    )
+    startup.add_argument(
+        "--budget",
+        type=float,
+        default=STARTUP_BUDGET_MS,
+        help=f"Ruxsat etilgan vaqt, ms (standart: {STARTUP_BUDGET_MS})",
+    )
+
+    return parser
+
+
+def report_errors(errors, report: str):
+    if not errors:
+        return
+    import bulk
+
+    bulk.write_error_report(errors, report)
+    for line_no, message in errors[:20]:
+        print(f"  ! {line_no}-qator: {message}")
+    print(f"❌ Xatolar: {len(errors)} ta -> {report}")
+
+
+def startup_report(budget: float):
+    steps = [("import+loglarni sozlash", time.perf_counter() - STARTED)]
+
+    start = time.perf_counter()
+    import ui
+
+    steps.append(("ui importi", time.perf_counter() - start))
+
+    # read-only: a diagnostic run must not create the admin or data files
+    start = time.perf_counter()
+    ui.user_count()
+    steps.append(("admin tekshiruvi", time.perf_counter() - start))
+
+    total = (time.perf_counter() - STARTED) * 1000
+    for name, seconds in steps:
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+    print(f"  {'jami':<24} {total:8.1f} ms (chegara: {budget:.0f} ms)")
+    if total > budget:
+        print("❌ Ishga tushish chegaradan oshdi")
+        raise SystemExit(1)
+    print("✓ Chegara ichida")
+
+
 def main():
+    args = build_parser().parse_args()
     configure_logging()
-    run_cli()
+
+    match args.command:
+        case "migrate":
+            import storage
+
+            counts = storage.migrate(args.target, args.path)
+            print(
+                f"✓ Ko'chirildi: {counts['users']} user, {counts['subjects']} fan"
+                f" -> {args.target}"
+            )
+        case "verify-aggregates":
+            import storage
+
+            drift = storage.verify_aggregates(fix=args.fix)
+            for line in drift:
+                print(f"  ! {line}")
+            if not drift:
+                print("✓ Yig'indilar to'g'ri")
+            elif args.fix:
+                print(f"✓ Tuzatildi: {len(drift)} ta yozuv")
+            else:
+                print(f"❌ Farqlar: {len(drift)} ta yozuv")
+                raise SystemExit(1)
+        case "import-grades":
+            import bulk
+
+            result = bulk.import_grades(args.subject.upper(), args.file)
+            print(
+                f"✓ Yozildi: {result['applied']} baho, {result['students']} talaba"
+                f" ({result['rows']} qator)"
+            )
+            report_errors(
+                result["errors"], f"import_errors_{args.subject.upper()}.csv"
+            )
+        case "enroll":
+            import bulk
+
+            result = bulk.enroll_roster(args.file)
+            print(
+                f"✓ Yozildi: {result['enrolled']} talaba, {result['subjects']} fan"
+                f" ({result['skipped']} allaqachon yozilgan)"
+            )
+            report_errors(result["errors"], "enroll_errors.csv")
+        case "assign-teachers":
+            import bulk
+
+            result = bulk.assign_roster(args.file)
+            print(
+                f"✓ Tayinlandi: {result['assigned']} fan,"
+                f" {result['teachers']} o'qituvchi"
+            )
+            report_errors(result["errors"], "assign_errors.csv")
+        case "export-reports":
+            import reports
+
+            result = reports.export_all(args.out, args.workers, args.force)
+            print(
+                f"✓ Yozildi: {result['written']} hisobot,"
+                f" o'zgarmagan: {result['skipped']}"
+                f" ({result['students']} talaba, {result['subjects']} fan)"
+            )
+        case "serve":
+            import asyncio
+            import server
+
+            try:
+                asyncio.run(server.serve(args.host, args.port))
+            except KeyboardInterrupt:
+                print("\n👋 Server to'xtatildi")
+        case "close-term":
+            import storage
+
+            try:
+                result = storage.close_term(args.name)
+            except ValueError as e:
+                raise SystemExit(f"❌ {e}")
+            print(
+                f"✓ Arxivlandi: {result['students']} talaba,"
+                f" {result['subjects']} fan -> {storage.ARCHIVE_DIR}/"
+            )
+        case "convert":
+            import storage
+
+            result = storage.convert(args.format, args.out)
+            print(
+                f"✓ {args.format}: {result['users']} user, {result['subjects']} fan,"
+                f" {result['bytes']} bayt -> {args.out or storage.DATA_FILE}"
+            )
+        case "startup-report":
+            startup_report(args.budget)
+        case _:
+            from ui import run_cli
+
+            run_cli()
 
 
 if __name__ == "__main__":
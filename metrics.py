@@ -0,0 +1,121 @@
+import json
+import math
+import threading
+from typing import Dict, Any, List
+
+BUCKET_BASE = 1.1
+MIN_MS = 0.001
+PERCENTILES = (50, 95, 99)
+IO_COUNTERS = (
+    "storage.load_data",
+    "storage.save_data",
+    "storage.disk_reads",
+    "storage.disk_writes",
+    "storage.bytes_read",
+    "storage.bytes_written",
+    "storage.parse_seconds",
+    "storage.serialize_seconds",
+)
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_actions: Dict[str, Dict[str, Any]] = {}
+
+
+class Histogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        i = 0 if ms <= MIN_MS else int(math.log(ms / MIN_MS, BUCKET_BASE)) + 1
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+    def percentile(self, q: float):
+        if not self.count:
+            return None
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                return min(MIN_MS * BUCKET_BASE**i, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        result = {f"p{q}": self.percentile(q) for q in PERCENTILES}
+        result["mean"] = self.total / self.count if self.count else None
+        result["max"] = self.max
+        return result
+
+
+def add(name: str, value: float = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def counters() -> Dict[str, float]:
+    with _lock:
+        return dict(_counters)
+
+
+def io_snapshot() -> List[float]:
+    with _lock:
+        return [_counters.get(name, 0) for name in IO_COUNTERS]
+
+
+def record(action: str, wall: float, cpu: float, before: List[float], ok: bool):
+    after = io_snapshot()
+    with _lock:
+        entry = _actions.get(action)
+        if entry is None:
+            entry = _actions[action] = {
+                "wall": Histogram(),
+                "cpu": Histogram(),
+                "errors": 0,
+                "io": [0] * len(IO_COUNTERS),
+            }
+        entry["wall"].add(wall * 1000)
+        entry["cpu"].add(cpu * 1000)
+        if not ok:
+            entry["errors"] += 1
+        for i, value in enumerate(after):
+            entry["io"][i] += value - before[i]
+
+
+def report() -> Dict[str, Any]:
+    with _lock:
+        actions = {}
+        for name, entry in sorted(_actions.items()):
+            calls = entry["wall"].count
+            actions[name] = {
+                "calls": calls,
+                "errors": entry["errors"],
+                "wall_ms": entry["wall"].summary(),
+                "cpu_ms": entry["cpu"].summary(),
+                "storage_per_call": {
+                    counter.split(".", 1)[1]: total / calls
+                    for counter, total in zip(IO_COUNTERS, entry["io"])
+                },
+            }
+        return {"actions": actions, "counters": dict(_counters)}
+
+
+def dump(path: str) -> Dict[str, Any]:
+    result = report()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _actions.clear()
@@ -1,12 +1,15 @@
 from abc import ABC, abstractmethod
+from array import array
+from sys import intern
 from typing import Dict, List
-import statistics
 import datetime
 
 
 class User(ABC):
+    __slots__ = ("username", "_password", "role")
+
     def __init__(self, username: str, password: str, role: str):
-        self.username = username
+        self.username = intern(username)
         self._password = password
         self.role = role.strip().capitalize()
 
@@ -22,6 +25,8 @@ class User(ABC):
 
 
 class Subject:
+    __slots__ = ("name", "code", "teacher", "students")
+
     def __init__(self, name: str, code: str):
         self.name = name
         self.code = code
@@ -44,48 +49,294 @@ class Subject:
         return subject
 
 
+class SubjectGrades:
+    __slots__ = ("names", "values", "total")
+
+    def __init__(self, grades: Dict[str, float] = None):
+        self.names: List[str] = []
+        self.values = array("d")
+        self.total = 0.0
+        for assignment, grade in (grades or {}).items():
+            self.set(assignment, grade)
+
+    def __len__(self):
+        return len(self.values)
+
+    def set(self, assignment: str, grade: float):
+        grade = float(grade)
+        try:
+            i = self.names.index(assignment)
+        except ValueError:
+            self.names.append(intern(assignment))
+            self.values.append(grade)
+            self.total += grade
+            return grade, 1
+        delta = grade - self.values[i]
+        self.values[i] = grade
+        self.total += delta
+        return delta, 0
+
+    def average(self):
+        return self.total / len(self.values) if self.values else None
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(zip(self.names, self.values))
+
+
+class AttendanceDays:
+    __slots__ = ("base", "bits")
+
+    def __init__(self, dates: List[str] = None):
+        self.base = None
+        self.bits = 0
+        for date_str in dates or ():
+            self.add(date_str)
+
+    @classmethod
+    def from_value(cls, value):
+        if isinstance(value, AttendanceDays):
+            return value
+        if isinstance(value, dict):
+            days = cls()
+            if value.get("start"):
+                days.base = datetime.date.fromisoformat(value["start"]).toordinal()
+                days.bits = int(value.get("bits") or "0", 16)
+                days._normalize()
+            return days
+        return cls(value)
+
+    def _normalize(self):
+        if not self.bits:
+            self.base = None
+            return
+        # keep the lowest set bit at offset 0 so cleared days don't linger
+        shift = (self.bits & -self.bits).bit_length() - 1
+        if shift:
+            self.bits >>= shift
+            self.base += shift
+
+    def to_dict(self) -> Dict[str, str]:
+        self._normalize()
+        if not self.bits:
+            return {"start": None, "bits": "0"}
+        start = datetime.date.fromordinal(self.base).isoformat()
+        return {"start": start, "bits": format(self.bits, "x")}
+
+    def _offset(self, date_str: str, grow: bool = False):
+        day = datetime.date.fromisoformat(date_str).toordinal()
+        if self.base is None or not self.bits:
+            if not grow:
+                return None
+            self.base = day
+        if day < self.base:
+            if not grow:
+                return None
+            self.bits <<= self.base - day
+            self.base = day
+        return day - self.base
+
+    def add(self, date_str: str) -> bool:
+        offset = self._offset(date_str, grow=True)
+        if self.bits >> offset & 1:
+            return False
+        self.bits |= 1 << offset
+        return True
+
+    def remove(self, date_str: str) -> bool:
+        offset = self._offset(date_str)
+        if offset is None or not self.bits >> offset & 1:
+            return False
+        self.bits &= ~(1 << offset)
+        self._normalize()
+        return True
+
+    def __contains__(self, date_str: str) -> bool:
+        offset = self._offset(date_str)
+        return offset is not None and bool(self.bits >> offset & 1)
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __iter__(self):
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            day = self.base + low.bit_length() - 1
+            yield datetime.date.fromordinal(day).isoformat()
+            bits ^= low
+
+    def _aligned(self, base: int) -> int:
+        if self.base is None or not self.bits:
+            return 0
+        if self.base >= base:
+            return self.bits << (self.base - base)
+        return self.bits >> (base - self.base)
+
+    def count_between(self, start: str, end: str) -> int:
+        if not self.bits:
+            return 0
+        first = datetime.date.fromisoformat(start).toordinal()
+        last = datetime.date.fromisoformat(end).toordinal()
+        if last < first:
+            return 0
+        window = self._aligned(first) & ((1 << (last - first + 1)) - 1)
+        return bin(window).count("1")
+
+    def union(self, other: "AttendanceDays") -> "AttendanceDays":
+        merged = AttendanceDays()
+        bases = [d.base for d in (self, other) if d.bits]
+        if bases:
+            merged.base = min(bases)
+            merged.bits = self._aligned(merged.base) | other._aligned(merged.base)
+        merged._normalize()
+        return merged
+
+    def rate(self, held: "AttendanceDays"):
+        if not held.bits:
+            return None
+        attended = held._aligned(held.base) & self._aligned(held.base)
+        return bin(attended).count("1") / len(held)
+
+
 class Student(User):
+    __slots__ = (
+        "_gradebook",
+        "_days",
+        "_total",
+        "_count",
+        "_pending_grades",
+        "_pending_days",
+    )
+
     def __init__(self, username: str, password: str):
         super().__init__(username, password, role="Student")
-        self._grades: Dict[str, Dict[str, float]] = {}
-        self._attendance: Dict[str, List[str]] = {}
+        self._gradebook: Dict[str, SubjectGrades] = {}
+        self._days: Dict[str, AttendanceDays] = {}
+        self._total = 0.0
+        self._count = 0
+        self._pending_grades: Dict[str, Dict[str, float]] = {}
+        self._pending_days: Dict[str, object] = {}
+
+    def defer(self, grades=None, attendance=None, total=None):
+        self._pending_grades.update(grades or {})
+        self._pending_days.update(attendance or {})
+        if total is not None:
+            self._total, self._count = float(total[0]), int(total[1])
+        elif self._pending_grades:
+            self._count = None  # summed on first overall_average
+
+    def _book(self, subject_code: str, create: bool = False):
+        book = self._gradebook.get(subject_code)
+        if book is None:
+            raw = self._pending_grades.pop(subject_code, None)
+            if raw is not None or create:
+                book = SubjectGrades(raw)
+                self._gradebook[intern(subject_code)] = book
+        return book
+
+    def _day_set(self, subject_code: str, create: bool = False):
+        days = self._days.get(subject_code)
+        if days is None:
+            raw = self._pending_days.pop(subject_code, None)
+            if raw is not None or create:
+                days = AttendanceDays.from_value(raw)
+                self._days[intern(subject_code)] = days
+        return days
+
+    def _load_all(self):
+        for code in list(self._pending_grades):
+            self._book(code)
+        for code in list(self._pending_days):
+            self._day_set(code)
+        if self._count is None:
+            self._total = sum(book.total for book in self._gradebook.values())
+            self._count = sum(len(book) for book in self._gradebook.values())
+
+    @property
+    def _grades(self) -> Dict[str, Dict[str, float]]:
+        self._load_all()
+        return {code: book.to_dict() for code, book in self._gradebook.items()}
+
+    @_grades.setter
+    def _grades(self, grades: Dict[str, Dict[str, float]]):
+        self._pending_grades = {}
+        self._gradebook = {
+            intern(code): SubjectGrades(subject_grades)
+            for code, subject_grades in grades.items()
+            if isinstance(subject_grades, dict)
+        }
+        self._total = sum(book.total for book in self._gradebook.values())
+        self._count = sum(len(book) for book in self._gradebook.values())
+
+    @property
+    def _attendance(self) -> Dict[str, List[str]]:
+        self._load_all()
+        return {code: list(days) for code, days in self._days.items()}
+
+    @_attendance.setter
+    def _attendance(self, attendance):
+        self._pending_days = {}
+        self._days = {
+            intern(code): AttendanceDays.from_value(value)
+            for code, value in attendance.items()
+        }
+
+    def attendance_books(self) -> Dict[str, AttendanceDays]:
+        self._load_all()
+        return dict(self._days)
 
     @property
     def grades(self) -> Dict[str, Dict[str, float]]:
-        return dict(self._grades)
+        return self._grades
 
     @property
     def attendance(self) -> Dict[str, List[str]]:
         return dict(self._attendance)
 
+    def attendance_days(self, subject_code: str):
+        return self._day_set(subject_code)
+
     def add_attendance(self, subject_code: str, date_str: str = None):
         date_str = date_str or datetime.date.today().isoformat()
-        if subject_code not in self._attendance:
-            self._attendance[subject_code] = []
-        self._attendance[subject_code].append(date_str)
+        self.set_attendance(subject_code, date_str, True)
+
+    def set_attendance(self, subject_code: str, date_str: str, present: bool):
+        days = self._day_set(subject_code, create=True)
+        if present:
+            return days.add(date_str)
+        return days.remove(date_str)
 
     def add_grade(self, subject_code: str, assignment: str, grade: float):
-        if subject_code not in self._grades:
-            self._grades[subject_code] = {}
-        self._grades[subject_code][assignment] = float(grade)
+        book = self._book(subject_code, create=True)
+        delta, added = book.set(assignment, grade)
+        if self._count is not None:
+            self._total += delta
+            self._count += added
+
+    def gradebook(self, subject_code: str):
+        return self._book(subject_code)
 
     def average_by_subject(self, subject_code: str):
-        if subject_code not in self._grades or not self._grades[subject_code]:
+        book = self._book(subject_code)
+        if not book:
             return None
-        grades = self._grades[subject_code]
-        if isinstance(grades, dict):
-            return statistics.mean(grades.values())
-        return None
+        return book.average()
 
     @property
     def overall_average(self):
-        all_grades = []
-        for subject_code, subject_grades in self._grades.items():
-            if isinstance(subject_grades, dict):
-                all_grades.extend(subject_grades.values())
-        if not all_grades:
+        if self._count is None:
+            self._load_all()
+        if not self._count:
             return None
-        return statistics.mean(all_grades)
+        return self._total / self._count
+
+    def grade_totals(self) -> Dict[str, List[float]]:
+        self._load_all()
+        return {
+            code: [book.total, len(book)]
+            for code, book in self._gradebook.items()
+            if book
+        }
 
     def menu_options(self):
         return {
@@ -101,6 +352,8 @@ class Student(User):
 
 
 class Teacher(User):
+    __slots__ = ("subjects",)
+
     def __init__(self, username: str, password: str, subjects: List[str] = None):
         super().__init__(username, password, role="Teacher")
         self.subjects = subjects or []
@@ -110,32 +363,44 @@ class Teacher(User):
     ):
         student.add_attendance(subject_code, date_str)
 
+    def roll_call(
+        self,
+        students: List[Student],
+        subject_code: str,
+        present: set,
+        date_str: str = None,
+    ):
+        date_str = date_str or datetime.date.today().isoformat()
+        marks = {"date": date_str, "present": [], "absent": [], "changed": 0}
+        for student in students:
+            is_present = student.username in present
+            if student.set_attendance(subject_code, date_str, is_present):
+                marks["changed"] += 1
+            marks["present" if is_present else "absent"].append(student.username)
+        return marks
+
     def record_grade(
         self, student: Student, subject_code: str, assignment: str, grade: float
     ):
         student.add_grade(subject_code, assignment, grade)
 
     def analyze_subject(self, students: List[Student], subject_code: str):
-        averages = [
-            s.average_by_subject(subject_code)
-            for s in students
-            if s.average_by_subject(subject_code) is not None
-        ]
-        return {
-            "subject_mean": statistics.mean(averages) if averages else None,
-            "subject_median": statistics.median(averages) if averages else None,
-            "students_count": len(students),
-        }
+        import analytics
+
+        return analytics.subject_stats(students, subject_code)
 
     def menu_options(self):
         return {
             "record_attendance": self.record_attendance,
+            "roll_call": self.roll_call,
             "record_grade": self.record_grade,
             "analyze_subject": self.analyze_subject,
         }
 
 
 class Admin(User):
+    __slots__ = ()
+
     def __init__(self, username: str, password: str):
         super().__init__(username, password, role="Admin")
 
@@ -0,0 +1,280 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import statistics
+from functools import partial
+from typing import Dict, Any, List
+
+import storage
+from models import AttendanceDays
+
+MANIFEST_FILE = ".reports_manifest.json"
+RENDER_VERSION = 1
+WRITE_BUFFER = 64 * 1024
+MANIFEST_EVERY = 500
+SERIAL_BELOW = 64
+
+
+def _overall_average(student):
+    # statistics.mean as the report always printed it; the running float total
+    # can differ in the last digits and would turn "85" into "85.0"
+    grades = [
+        grade
+        for subject_grades in student.grades.values()
+        if isinstance(subject_grades, dict)
+        for grade in subject_grades.values()
+    ]
+    return statistics.mean(grades) if grades else None
+
+
+def render_student_report(student, subject_names: Dict[str, str]) -> str:
+    out = io.StringIO()
+    out.write("=" * 50 + "\n")
+    out.write("TALABA HISOBOTI\n")
+    out.write("=" * 50 + "\n\n")
+    out.write(f"Talaba: {student.username}\n")
+    out.write(f"Umumiy o'rtacha: {_overall_average(student) or 'N/A'}\n\n")
+
+    out.write("BAHOLAR:\n" + "-" * 50 + "\n")
+
+    grades = student.grades
+    if grades:
+        for subject_code, subject_grades in grades.items():
+            subject_name = subject_names.get(subject_code, subject_code)
+            out.write(f"\n{subject_name} [{subject_code}]:\n")
+
+            if subject_grades:
+                subject_avg = student.average_by_subject(subject_code)
+                out.write(f"  O'rtacha: {subject_avg:.2f}\n")
+                for task, grade in subject_grades.items():
+                    out.write(f"  {task}: {grade}\n")
+            else:
+                out.write("  Baholar yo'q\n")
+    else:
+        out.write("Yo'q\n")
+
+    out.write("\n" + "=" * 50 + "\n")
+    return out.getvalue()
+
+
+def render_subject_report(subject: Dict[str, Any], result: Dict[str, Any]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Metric", "Value"])
+    writer.writerow(["Fan", subject["name"]])
+    writer.writerow(["Kod", subject["code"]])
+    writer.writerow(["Talabalar", result.get("students_count")])
+    writer.writerow(["O'rtacha", result.get("subject_mean")])
+    writer.writerow(["Median", result.get("subject_median")])
+    writer.writerow(["Std", result.get("subject_stdev")])
+    writer.writerow(["Min", result.get("subject_min")])
+    writer.writerow(["Max", result.get("subject_max")])
+    writer.writerow(["Baholar soni", result.get("grades_count")])
+    for task, avg in result.get("assignment_means", {}).items():
+        writer.writerow([f"Vazifa: {task}", avg])
+    for band, count in result.get("histogram", {}).items():
+        writer.writerow([f"Oraliq: {band}", count])
+    return out.getvalue()
+
+
+def _transcript_lines(out, grades, attendance, subject_names):
+    codes = list(grades) + [c for c in attendance if c not in grades]
+    if not codes:
+        out.write("  Yo'q\n")
+    for code in codes:
+        subject_grades = grades.get(code) or {}
+        days = len(AttendanceDays.from_value(attendance.get(code, [])))
+        if subject_grades:
+            avg = sum(subject_grades.values()) / len(subject_grades)
+            summary = f"o'rtacha {avg:.2f} ({len(subject_grades)} baho)"
+        else:
+            summary = "baholar yo'q"
+        name = subject_names.get(code, code)
+        out.write(f"  {name} [{code}]: {summary}, davomat: {days} kun\n")
+
+
+def render_transcript(student, subject_names: Dict[str, str], terms: List) -> str:
+    out = io.StringIO()
+    out.write("=" * 50 + "\n")
+    out.write("TRANSKRIPT\n")
+    out.write("=" * 50 + "\n\n")
+    out.write(f"Talaba: {student.username}\n")
+
+    for term in terms:
+        out.write(f"\nSemestr {term['term']} (yopilgan: {term['closed']}):\n")
+        _transcript_lines(
+            out, term["grades"], term["attendance"], term["subject_names"]
+        )
+
+    out.write("\nJoriy semestr:\n")
+    _transcript_lines(out, student.grades, student.attendance, subject_names)
+    out.write("\n" + "=" * 50 + "\n")
+    return out.getvalue()
+
+
+def transcript_name(username: str) -> str:
+    return f"transcript_{username}.txt"
+
+
+def student_report_name(username: str) -> str:
+    return f"report_{username}.txt"
+
+
+def subject_report_name(code: str) -> str:
+    return f"report_{code}.csv"
+
+
+def write_report(path: str, text: str):
+    newline = "" if path.endswith(".csv") else None
+    with open(
+        path, "w", encoding="utf-8", newline=newline, buffering=WRITE_BUFFER
+    ) as f:
+        f.write(text)
+
+
+def _digest(payload) -> str:
+    text = json.dumps([RENDER_VERSION, payload], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _student_task(rec: Dict[str, Any], subject_names: Dict[str, str]):
+    grades = rec.get("grades") or {}
+    names = {code: subject_names.get(code, code) for code in grades}
+    payload = {
+        "username": rec["username"],
+        "grades": grades,
+        "names": names,
+    }
+    return "student", student_report_name(rec["username"]), payload
+
+
+def _subject_task(subject: Dict[str, Any], users: Dict[str, Dict[str, Any]]):
+    code = subject["code"]
+    grades = {}
+    for username in subject.get("students", []):
+        rec = users.get(username)
+        if rec is not None:
+            grades[username] = (rec.get("grades") or {}).get(code)
+    payload = {
+        "name": subject["name"],
+        "code": code,
+        "grades": grades,
+    }
+    return "subject", subject_report_name(code), payload
+
+
+def _render(kind: str, payload: Dict[str, Any]) -> str:
+    if kind == "student":
+        student = storage.instantiate_user_from_record(
+            {
+                "username": payload["username"],
+                "password": "",
+                "role": "Student",
+                "grades": payload["grades"],
+            }
+        )
+        return render_student_report(student, payload["names"])
+
+    code = payload["code"]
+    students = [
+        storage.instantiate_user_from_record(
+            {
+                "username": username,
+                "password": "",
+                "role": "Student",
+                "grades": {code: grades} if grades else {},
+            }
+        )
+        for username, grades in payload["grades"].items()
+    ]
+    import analytics
+
+    result = analytics.subject_stats(students, code)
+    return render_subject_report(payload, result)
+
+
+def _render_batch(out_dir: str, batch):
+    done = []
+    for kind, name, payload, digest in batch:
+        write_report(os.path.join(out_dir, name), _render(kind, payload))
+        done.append((name, digest))
+    return done
+
+
+def _load_manifest(path: str) -> Dict[str, str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _save_manifest(path: str, manifest: Dict[str, str]):
+    storage._write_atomic(json.dumps(manifest, indent=0, sort_keys=True), path)
+
+
+def _batches(tasks: List, size: int):
+    for start in range(0, len(tasks), size):
+        yield tasks[start : start + size]
+
+
+def export_all(out_dir: str = ".", workers: int = None, force: bool = False) -> Dict:
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    data = storage.load_data()
+    subject_names = {s["code"]: s["name"] for s in data.get("subjects", [])}
+    students = [u for u in data.get("users", []) if u.get("role") == "Student"]
+    users = {u["username"]: u for u in students}
+
+    tasks = [_student_task(rec, subject_names) for rec in students]
+    tasks += [_subject_task(s, users) for s in data.get("subjects", [])]
+
+    pending = []
+    skipped = 0
+    for kind, name, payload in tasks:
+        digest = _digest(payload)
+        if manifest.get(name) == digest and os.path.exists(
+            os.path.join(out_dir, name)
+        ):
+            skipped += 1
+            continue
+        pending.append((kind, name, payload, digest))
+
+    workers = workers or os.cpu_count() or 1
+    size = max(1, min(256, len(pending) // (workers * 4)))
+    render = partial(_render_batch, out_dir)
+    pool = None
+    if workers > 1 and len(pending) >= SERIAL_BELOW:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(render, _batches(pending, size))
+    else:
+        results = map(render, _batches(pending, size))
+
+    written = 0
+    since_save = 0
+    try:
+        for done in results:
+            manifest.update(done)
+            written += len(done)
+            since_save += len(done)
+            if since_save >= MANIFEST_EVERY:
+                _save_manifest(manifest_path, manifest)
+                since_save = 0
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        _save_manifest(manifest_path, manifest)
+
+    return {
+        "students": len(students),
+        "subjects": len(subject_names),
+        "written": written,
+        "skipped": skipped,
+    }
@@ -0,0 +1,395 @@
+import asyncio
+import datetime
+import json
+import logging
+import math
+from typing import Dict, Any, List
+
+import decorators
+import session
+import storage
+from models import Admin, Student, Subject, Teacher
+
+logger = logging.getLogger("educational")
+
+WRITE_BATCH = 256
+LINE_LIMIT = 1024 * 1024
+
+
+class Writer:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batches = 0
+        self.ops = 0
+
+    async def submit(self, ops: List[Dict[str, Any]], check=None):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((ops, check, future))
+        return await future
+
+    def _apply(self, batch):
+        results = []
+        try:
+            with storage.transaction():
+                for ops, check, _ in batch:
+                    try:
+                        if check is not None:
+                            check()
+                        results.append((True, [storage.apply(op) for op in ops]))
+                    except (ValueError, PermissionError) as e:
+                        results.append((False, e))
+        except RuntimeError:
+            # a failed op aborts the whole transaction; alone, its error is the
+            # answer, in a batch the others are retried one by one
+            if len(batch) == 1 and results and not results[0][0]:
+                return results
+            raise
+        return results
+
+    def _apply_batch(self, batch):
+        try:
+            return self._apply(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                return [(False, e)]
+            logger.exception("Yozish paketi bekor qilindi, bittalab qayta yoziladi")
+            return [result for item in batch for result in self._apply_batch([item])]
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < WRITE_BATCH and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            results = await asyncio.to_thread(self._apply_batch, batch)
+            self.batches += 1
+            self.ops += sum(len(ops) for ops, _, _ in batch)
+
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+
+def _public(rec):
+    if rec is None:
+        return None
+    return {k: v for k, v in rec.items() if k != "password"}
+
+
+def _require(args: Dict[str, Any], *names: str):
+    missing = [name for name in names if args.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"Maydon kerak: {', '.join(missing)}")
+    return [args[name] for name in names]
+
+
+def _user_with_role(username: str, role: str):
+    rec = storage.find_user(username)
+    if not rec or rec.get("role") != role:
+        raise ValueError(f"{username}: topilmadi")
+    return rec
+
+
+def _own_subject(code: str):
+    teacher = storage.find_user(session.get_user().username) or {}
+    if code not in teacher.get("subjects", []):
+        raise PermissionError("Bu fan sizga tegishli emas")
+    subject = storage.find_subject(code)
+    if not subject:
+        raise ValueError("Fan topilmadi")
+    return subject
+
+
+async def login(writer: Writer, args):
+    username, password = _require(args, "username", "password")
+    rec = storage.find_user(username)
+    user = storage.instantiate_user_from_record(rec, fields=()) if rec else None
+    if not user or not user.authenticate(password):
+        raise PermissionError("Login yoki parol xato")
+    session.set_user(user)
+    logger.info("%s - login", user.username)
+    return {"username": user.username, "role": user.role}
+
+
+async def logout(writer: Writer, args):
+    session.set_user(None)
+    return True
+
+
+async def whoami(writer: Writer, args):
+    user = session.get_user()
+    return {"username": user.username, "role": user.role} if user else None
+
+
+@decorators.require_role("Admin")
+@decorators.log_action
+async def users(writer: Writer, args):
+    if args.get("role"):
+        records = storage.list_users_by_role(args["role"].strip().capitalize())
+    else:
+        records = storage.list_users()
+    return [_public(u) for u in records]
+
+
+@decorators.require_role("Admin", "Teacher", "Student")
+@decorators.log_action
+async def subjects(writer: Writer, args):
+    return storage.list_subjects()
+
+
+@decorators.require_role("Admin")
+@decorators.log_action
+async def create_user(writer: Writer, args):
+    username, password, role = _require(args, "username", "password", "role")
+    match role.strip().capitalize():
+        case "Student":
+            user = Student(username, password)
+        case "Teacher":
+            user = Teacher(username, password)
+        case "Admin":
+            user = Admin(username, password)
+        case _:
+            raise ValueError(f"Noma'lum rol: {role}")
+
+    def check():
+        if storage.find_user(username):
+            raise ValueError("Bu login band")
+
+    record = storage.user_record(user)
+    await writer.submit([{"op": "add_user", "record": record}], check)
+    return {"username": user.username, "role": user.role}
+
+
+@decorators.require_role("Admin")
+@decorators.log_action
+async def create_subject(writer: Writer, args):
+    code, name = _require(args, "code", "name")
+    subject = Subject(name.strip(), code.strip().upper())
+
+    def check():
+        if storage.find_subject(subject.code):
+            raise ValueError("Bu kod mavjud")
+
+    record = storage.subject_record(subject)
+    await writer.submit([{"op": "add_subject", "record": record}], check)
+    return record
+
+
+@decorators.require_role("Admin")
+@decorators.log_action
+async def assign_teacher(writer: Writer, args):
+    code, teacher = _require(args, "code", "teacher")
+    code = code.upper()
+    ops = []
+
+    def check():
+        if not storage.find_subject(code):
+            raise ValueError("Fan topilmadi")
+        rec = _user_with_role(teacher, "Teacher")
+        ops[:] = [
+            {"op": "update_subject", "code": code, "fields": {"teacher": teacher}}
+        ]
+        current = rec.get("subjects", [])
+        if code not in current:
+            ops.append(
+                {
+                    "op": "update_user",
+                    "username": teacher,
+                    "fields": {"subjects": current + [code]},
+                }
+            )
+
+    await writer.submit(ops, check)
+    return {"code": code, "teacher": teacher}
+
+
+@decorators.require_role("Admin")
+@decorators.log_action
+async def enroll(writer: Writer, args):
+    code, usernames = _require(args, "code", "usernames")
+    if not isinstance(usernames, list) or not all(
+        isinstance(u, str) for u in usernames
+    ):
+        raise ValueError("usernames satrlar ro'yxati bo'lishi kerak")
+    code = code.upper()
+    for username in usernames:
+        _user_with_role(username, "Student")
+    op = {"op": "enroll", "code": code, "usernames": list(usernames)}
+
+    def check():
+        if not storage.find_subject(code):
+            raise ValueError("Fan topilmadi")
+
+    await writer.submit([op], check)
+    return {"code": code, "enrolled": len(usernames)}
+
+
+@decorators.require_role("Teacher")
+@decorators.log_action
+async def roll_call(writer: Writer, args):
+    (code,) = _require(args, "code")
+    code = code.upper()
+    subject = _own_subject(code)
+    enrolled = subject.get("students", [])
+
+    present = set(args.get("present", []))
+    unknown = present.difference(enrolled)
+    if unknown:
+        raise ValueError(f"Bu fanda emas: {', '.join(sorted(unknown))}")
+    try:
+        date_str = datetime.date.fromisoformat(
+            args.get("date") or datetime.date.today().isoformat()
+        ).isoformat()
+    except ValueError:
+        raise ValueError("Noto'g'ri sana")
+
+    op = {
+        "op": "roll_call",
+        "code": code,
+        "date": date_str,
+        "present": [u for u in enrolled if u in present],
+        "absent": [u for u in enrolled if u not in present],
+    }
+    await writer.submit([op])
+    return {
+        "date": date_str,
+        "present": len(op["present"]),
+        "absent": len(op["absent"]),
+    }
+
+
+@decorators.require_role("Teacher")
+@decorators.log_action
+async def set_grade(writer: Writer, args):
+    code, username, assignment, grade = _require(
+        args, "code", "username", "assignment", "grade"
+    )
+    code = code.upper()
+    if username not in _own_subject(code).get("students", []):
+        raise ValueError("Bu talaba bu fanda emas")
+    try:
+        grade = float(grade)
+    except (TypeError, ValueError):
+        raise ValueError(f"Noto'g'ri baho: {grade!r}")
+    if math.isnan(grade) or not 0 <= grade <= 100:
+        raise ValueError("Baho 0-100 oralig'ida bo'lishi kerak")
+
+    op = {
+        "op": "set_grade",
+        "username": username,
+        "subject": code,
+        "assignment": assignment,
+        "grade": grade,
+    }
+    await writer.submit([op])
+    return {"username": username, "assignment": assignment, "grade": grade}
+
+
+@decorators.require_role("Teacher")
+@decorators.log_action
+async def subject_stats(writer: Writer, args):
+    (code,) = _require(args, "code")
+    code = code.upper()
+    subject = _own_subject(code)
+    records = (storage.find_user(name) for name in subject.get("students", []))
+    students = [
+        storage.instantiate_user_from_record(rec, subjects=[code], fields=("grades",))
+        for rec in records
+        if rec
+    ]
+    return session.get_user().analyze_subject(students, code)
+
+
+@decorators.require_role("Student")
+@decorators.log_action
+async def progress(writer: Writer, args):
+    rec = storage.find_user(session.get_user().username)
+    student = storage.instantiate_user_from_record(rec, fields=("grades",))
+    return student.view_progress()
+
+
+@decorators.require_role("Student")
+@decorators.log_action
+async def attendance(writer: Writer, args):
+    rec = storage.find_user(session.get_user().username)
+    student = storage.instantiate_user_from_record(rec, fields=("attendance",))
+    return student.view_attendance()
+
+
+COMMANDS = {
+    "login": login,
+    "logout": logout,
+    "whoami": whoami,
+    "users": users,
+    "subjects": subjects,
+    "create_user": create_user,
+    "create_subject": create_subject,
+    "assign_teacher": assign_teacher,
+    "enroll": enroll,
+    "roll_call": roll_call,
+    "set_grade": set_grade,
+    "subject_stats": subject_stats,
+    "progress": progress,
+    "attendance": attendance,
+}
+
+
+async def handle_request(writer: Writer, line: bytes) -> Dict[str, Any]:
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("JSON obyekt kutilgan")
+        command = COMMANDS.get(request.get("cmd"))
+        if command is None:
+            raise ValueError(f"Noma'lum buyruq: {request.get('cmd')}")
+        result = await command(writer, request.get("args") or {})
+    except PermissionError as e:
+        return {"ok": False, "error": str(e), "code": "forbidden"}
+    except ValueError as e:
+        return {"ok": False, "error": str(e), "code": "invalid"}
+    except Exception as e:
+        logger.exception("So'rov bajarilmadi")
+        return {"ok": False, "error": str(e), "code": "error"}
+    return {"ok": True, "result": result}
+
+
+def _connection_handler(writer: Writer):
+    async def handle(reader, stream):
+        session.set_user(None)
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                response = await handle_request(writer, line)
+                stream.write(json.dumps(response).encode("utf-8") + b"\n")
+                await stream.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            stream.close()
+
+    return handle
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8765):
+    from ui import ensure_admin
+
+    ensure_admin()
+    storage.load_data()
+
+    writer = Writer()
+    writer_task = asyncio.create_task(writer.run())
+    server = await asyncio.start_server(
+        _connection_handler(writer), host, port, limit=LINE_LIMIT
+    )
+    logger.info("server - %s:%s", host, port)
+    print(f"✓ Server ishga tushdi: {host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        writer_task.cancel()
@@ -1,2 +1,15 @@
+from contextvars import ContextVar
+
 current_user = None
 
+_UNSET = object()
+_user = ContextVar("current_user", default=_UNSET)
+
+
+def get_user():
+    user = _user.get()
+    return current_user if user is _UNSET else user
+
+
+def set_user(user):
+    return _user.set(user)
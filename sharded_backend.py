@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, Any, List
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from storage import (
+    _access_lock,
+    _mark_attendance,
+    _retotal_user,
+    _roll_call_marks,
+    _set_grade,
+    _stat_key,
+    _write_atomic,
+)
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+
+class ShardedBackend:
+    name = "sharded"
+
+    def __init__(self, root: str):
+        self.root = root
+        self._manifest = None
+        self._manifest_key = None
+        self._manifest_dirty = False
+        self._pending: Dict[str, Any] = {}
+        self._depth = 0
+        self._aborted = False
+        self._lock = None
+
+    def close(self):
+        self._unlock()
+
+    # subject files and the manifest are shared by every writer, so each
+    # outermost batch holds the directory lock and re-reads under it
+    def _acquire(self):
+        if fcntl is None:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = open(os.path.join(self.root, LOCK_FILE), "a")
+        fcntl.flock(self._lock.fileno(), fcntl.LOCK_EX)
+        self._manifest_key = None
+
+    def _unlock(self):
+        if self._lock is not None:
+            fcntl.flock(self._lock.fileno(), fcntl.LOCK_UN)
+            self._lock.close()
+            self._lock = None
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def _user_path(self, username: str) -> str:
+        bucket = hashlib.sha1(username.encode("utf-8")).hexdigest()[:2]
+        return os.path.join(
+            self.root, "users", bucket, quote(username, safe="") + ".json"
+        )
+
+    def _subject_path(self, code: str) -> str:
+        return os.path.join(self.root, "subjects", quote(code, safe="") + ".json")
+
+    def manifest(self) -> Dict[str, Any]:
+        if self._manifest_dirty:
+            return self._manifest
+
+        path = self._manifest_path()
+        key = _stat_key(path)
+        if key is None:
+            self._manifest = {"users": {}, "subjects": {}}
+        elif key != self._manifest_key:
+            with open(path, "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+        self._manifest_key = key
+        return self._manifest
+
+    def _save_manifest(self):
+        self._manifest_dirty = True
+        if not self._depth:
+            self._flush()
+
+    def _read(self, path: str):
+        if path in self._pending:
+            return self._pending[path]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, rec):
+        self._pending[path] = rec
+        if not self._depth:
+            self._flush()
+
+    # runs without the access lock: readers keep seeing the pending records
+    # until every file is in place, and only the swap below is locked
+    def _flush(self):
+        try:
+            for path, rec in self._pending.items():
+                if rec is None:
+                    if os.path.exists(path):
+                        os.unlink(path)
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _write_atomic(json.dumps(rec, indent=2), path)
+
+            if self._manifest_dirty:
+                os.makedirs(self.root, exist_ok=True)
+                path = self._manifest_path()
+                _write_atomic(json.dumps(self._manifest, indent=2), path)
+                with _access_lock:
+                    self._manifest_dirty = False
+                    self._manifest_key = _stat_key(path)
+        finally:
+            with _access_lock:
+                self._pending = {}
+
+    def begin(self):
+        if not self._depth:
+            self._acquire()
+        self._depth += 1
+
+    def commit(self):
+        if not self._depth:
+            raise RuntimeError("Tranzaksiya ochilmagan")
+        self._depth -= 1
+        if not self._depth:
+            if self._aborted:
+                self._discard()
+                raise RuntimeError("Ichki amal bekor qilingan, tranzaksiya saqlanmadi")
+            try:
+                self._flush()
+            finally:
+                self._unlock()
+
+    def rollback(self):
+        if self._depth > 1:
+            self._depth -= 1
+            self._aborted = True
+            return
+        self._discard()
+
+    def _discard(self):
+        self._depth = 0
+        self._aborted = False
+        self._pending = {}
+        self._manifest_dirty = False
+        self._manifest_key = None
+        self._unlock()
+
+    @contextmanager
+    def _batch(self):
+        self.begin()
+        try:
+            yield
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def load_data(self) -> Dict[str, Any]:
+        return {"users": self.list_users(), "subjects": self.list_subjects()}
+
+    def save_data(self, data: Dict[str, Any]):
+        with self._batch():
+            old = self.manifest()
+            users = {u["username"]: u.get("role") for u in data.get("users", [])}
+            subjects = {s["code"]: s.get("name") for s in data.get("subjects", [])}
+            for username in old["users"]:
+                if username not in users:
+                    self._write(self._user_path(username), None)
+            for code in old["subjects"]:
+                if code not in subjects:
+                    self._write(self._subject_path(code), None)
+
+            for rec in data.get("users", []):
+                self._write(self._user_path(rec["username"]), rec)
+            for rec in data.get("subjects", []):
+                self._write(self._subject_path(rec["code"]), rec)
+            self._manifest = {"users": users, "subjects": subjects}
+            self._save_manifest()
+
+    def iter_users(self):
+        for username in list(self.manifest()["users"]):
+            rec = self.find_user(username)
+            if rec is not None:
+                yield rec
+
+    def iter_subjects(self):
+        for code in list(self.manifest()["subjects"]):
+            rec = self.find_subject(code)
+            if rec is not None:
+                yield rec
+
+    def list_users(self) -> List[Dict[str, Any]]:
+        return list(self.iter_users())
+
+    def user_count(self) -> int:
+        return len(self.manifest()["users"])
+
+    def list_users_by_role(self, role: str) -> List[Dict[str, Any]]:
+        users = (
+            self.find_user(u)
+            for u, r in self.manifest()["users"].items()
+            if r == role
+        )
+        return [u for u in users if u is not None]
+
+    def list_subjects(self) -> List[Dict[str, Any]]:
+        return list(self.iter_subjects())
+
+    def find_user(self, username: str):
+        return self._read(self._user_path(username))
+
+    def find_subject(self, code: str):
+        return self._read(self._subject_path(code))
+
+    def _rename(self, entries: Dict[str, Any], old: str, new: str, value):
+        renamed = {}
+        for key, current in entries.items():
+            if key == old:
+                renamed[new] = value
+            else:
+                renamed[key] = current
+        return renamed
+
+    def _retotal(self, rec: Dict[str, Any], old_grades, new_grades):
+        for subject in _retotal_user(rec, old_grades, new_grades, self.find_subject):
+            self._write(self._subject_path(subject["code"]), subject)
+
+    def _update_user(self, username: str, fields: Dict[str, Any]) -> bool:
+        rec = self.find_user(username)
+        if rec is None:
+            return False
+        manifest = self.manifest()
+        role = rec.get("role")
+        if "grades" in fields:
+            self._retotal(rec, rec.get("grades"), fields["grades"])
+        rec.update(fields)
+
+        if rec["username"] != username:
+            self._write(self._user_path(username), None)
+            manifest["users"] = self._rename(
+                manifest["users"], username, rec["username"], rec.get("role")
+            )
+            self._save_manifest()
+        elif rec.get("role") != role:
+            manifest["users"][username] = rec.get("role")
+            self._save_manifest()
+        self._write(self._user_path(rec["username"]), rec)
+        return True
+
+    def _update_subject(self, code: str, fields: Dict[str, Any]) -> bool:
+        rec = self.find_subject(code)
+        if rec is None:
+            return False
+        manifest = self.manifest()
+        name = rec.get("name")
+        rec.update(fields)
+
+        if rec["code"] != code:
+            self._write(self._subject_path(code), None)
+            manifest["subjects"] = self._rename(
+                manifest["subjects"], code, rec["code"], rec.get("name")
+            )
+            self._save_manifest()
+        elif rec.get("name") != name:
+            manifest["subjects"][code] = rec.get("name")
+            self._save_manifest()
+        self._write(self._subject_path(rec["code"]), rec)
+        return True
+
+    def apply(self, op: Dict[str, Any]) -> bool:
+        kind = op["op"]
+        with self._batch():
+            manifest = self.manifest()
+            if kind == "add_user":
+                rec = op["record"]
+                if "grades" in rec:
+                    self._retotal(rec, {}, rec["grades"])
+                manifest["users"][rec["username"]] = rec.get("role")
+                self._save_manifest()
+                self._write(self._user_path(rec["username"]), rec)
+            elif kind == "add_subject":
+                rec = op["record"]
+                manifest["subjects"][rec["code"]] = rec.get("name")
+                self._save_manifest()
+                self._write(self._subject_path(rec["code"]), rec)
+            elif kind == "update_user":
+                return self._update_user(op["username"], op["fields"])
+            elif kind == "update_subject":
+                return self._update_subject(op["code"], op["fields"])
+            elif kind == "enroll":
+                subject = self.find_subject(op["code"])
+                if subject is None:
+                    return False
+                students = subject.setdefault("students", [])
+                present = set(students)
+                students.extend(
+                    u for u in dict.fromkeys(op["usernames"]) if u not in present
+                )
+                self._write(self._subject_path(op["code"]), subject)
+            elif kind == "roll_call":
+                for username, present in _roll_call_marks(op):
+                    rec = self.find_user(username)
+                    if rec and _mark_attendance(rec, op["code"], op["date"], present):
+                        self._write(self._user_path(username), rec)
+            elif kind == "set_grade":
+                rec = self.find_user(op["username"])
+                if rec is None:
+                    return False
+                subject = self.find_subject(op["subject"])
+                if _set_grade(
+                    rec, subject, op["subject"], op["assignment"], op["grade"]
+                ):
+                    self._write(self._subject_path(op["subject"]), subject)
+                self._write(self._user_path(op["username"]), rec)
+            elif kind == "delete_user":
+                if op["username"] not in manifest["users"]:
+                    return False
+                rec = self.find_user(op["username"])
+                if rec and rec.get("grades"):
+                    self._retotal(rec, rec["grades"], {})
+                del manifest["users"][op["username"]]
+                self._save_manifest()
+                self._write(self._user_path(op["username"]), None)
+            else:
+                raise ValueError(f"Noma'lum amal: {kind}")
+        return True
@@ -0,0 +1,494 @@
+import json
+import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+from storage import (
+    _access_lock,
+    _attendance_dates,
+    _grade_totals,
+    _normalize_attendance,
+    _normalize_grades,
+    _overall_total,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS users_role ON users (role);
+
+CREATE TABLE IF NOT EXISTS subjects (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    teacher TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS subjects_teacher ON subjects (teacher);
+
+CREATE TABLE IF NOT EXISTS teacher_subjects (
+    username TEXT NOT NULL,
+    code TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (username, code)
+);
+
+CREATE TABLE IF NOT EXISTS enrollments (
+    code TEXT NOT NULL,
+    username TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (code, username)
+);
+CREATE INDEX IF NOT EXISTS enrollments_user ON enrollments (username);
+
+CREATE TABLE IF NOT EXISTS grades (
+    username TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    assignment TEXT NOT NULL,
+    grade REAL NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (username, subject, assignment)
+);
+CREATE INDEX IF NOT EXISTS grades_subject ON grades (subject);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attendance_user ON attendance (username, subject);
+CREATE INDEX IF NOT EXISTS attendance_subject ON attendance (subject, day);
+"""
+
+USER_COLUMNS = ("username", "password", "role")
+USER_CHILDREN = ("subjects", "grades", "attendance", "grade_totals", "grade_total")
+SUBJECT_COLUMNS = ("code", "name", "teacher")
+SUBJECT_CHILDREN = ("students", "grade_total")
+
+
+def _extra(rec: Dict[str, Any], known) -> str:
+    extra = {k: v for k, v in rec.items() if k not in known}
+    return json.dumps(extra) if extra else None
+
+
+class SqliteBackend:
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._depth = 0
+        self._aborted = False
+
+    def close(self):
+        self.conn.close()
+
+    def begin(self):
+        if not self._depth:
+            self.conn.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+
+    def commit(self):
+        if not self._depth:
+            raise RuntimeError("Tranzaksiya ochilmagan")
+        self._depth -= 1
+        if self._depth:
+            return
+        if self._aborted:
+            self._aborted = False
+            self.conn.execute("ROLLBACK")
+            raise RuntimeError("Ichki amal bekor qilingan, tranzaksiya saqlanmadi")
+        # the connection is shared with reader threads; in WAL mode with
+        # synchronous=NORMAL a commit appends to the log without an fsync
+        with _access_lock:
+            self.conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._depth > 1:
+            self._depth -= 1
+            self._aborted = True
+        elif self._depth:
+            self._depth = 0
+            self._aborted = False
+            self.conn.execute("ROLLBACK")
+
+    @contextmanager
+    def _write(self):
+        self.begin()
+        try:
+            yield
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def _users(self, where: str = "", params=()) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            f"SELECT username, password, role, extra FROM users {where} ORDER BY rowid",
+            params,
+        ).fetchall()
+        if not rows:
+            return []
+
+        scope = f"SELECT username FROM users {where}"
+        subjects = defaultdict(list)
+        for username, code in self.conn.execute(
+            f"SELECT username, code FROM teacher_subjects "
+            f"WHERE username IN ({scope}) ORDER BY position",
+            params,
+        ):
+            subjects[username].append(code)
+
+        grades = defaultdict(dict)
+        for username, subject, assignment, grade in self.conn.execute(
+            f"SELECT username, subject, assignment, grade FROM grades "
+            f"WHERE username IN ({scope}) ORDER BY position",
+            params,
+        ):
+            grades[username].setdefault(subject, {})[assignment] = grade
+
+        attendance = defaultdict(dict)
+        for username, subject, day in self.conn.execute(
+            f"SELECT username, subject, day FROM attendance "
+            f"WHERE username IN ({scope}) ORDER BY id",
+            params,
+        ):
+            attendance[username].setdefault(subject, []).append(day)
+
+        users = []
+        for username, password, role, extra in rows:
+            rec = {"username": username, "password": password, "role": role}
+            if role == "Teacher" or username in subjects:
+                rec["subjects"] = subjects.get(username, [])
+            if role == "Student" or username in grades or username in attendance:
+                rec["grades"] = grades.get(username, {})
+                rec["attendance"] = attendance.get(username, {})
+                rec["grade_totals"] = _grade_totals(rec["grades"])
+                rec["grade_total"] = _overall_total(rec["grade_totals"])
+            if extra:
+                rec.update(json.loads(extra))
+            users.append(rec)
+        return users
+
+    def _subjects(self, where: str = "", params=()) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            f"SELECT code, name, teacher, extra FROM subjects {where} ORDER BY rowid",
+            params,
+        ).fetchall()
+        if not rows:
+            return []
+
+        students = defaultdict(list)
+        for code, username in self.conn.execute(
+            f"SELECT code, username FROM enrollments "
+            f"WHERE code IN (SELECT code FROM subjects {where}) ORDER BY position",
+            params,
+        ):
+            students[code].append(username)
+
+        totals = {
+            code: [total, count]
+            for code, total, count in self.conn.execute(
+                f"SELECT subject, TOTAL(grade), COUNT(*) FROM grades "
+                f"WHERE subject IN (SELECT code FROM subjects {where}) "
+                f"GROUP BY subject",
+                params,
+            )
+        }
+
+        subjects = []
+        for code, name, teacher, extra in rows:
+            rec = {
+                "name": name,
+                "code": code,
+                "teacher": teacher,
+                "students": students.get(code, []),
+                "grade_total": totals.get(code, [0.0, 0]),
+            }
+            if extra:
+                rec.update(json.loads(extra))
+            subjects.append(rec)
+        return subjects
+
+    def load_data(self) -> Dict[str, Any]:
+        return {"users": self.list_users(), "subjects": self.list_subjects()}
+
+    def save_data(self, data: Dict[str, Any]):
+        with self._write():
+            for table in (
+                "users",
+                "subjects",
+                "teacher_subjects",
+                "enrollments",
+                "grades",
+                "attendance",
+            ):
+                self.conn.execute(f"DELETE FROM {table}")
+            for rec in data.get("users", []):
+                self._insert_user(rec)
+            for rec in data.get("subjects", []):
+                self._insert_subject(rec)
+
+    def iter_users(self):
+        usernames = self.conn.execute(
+            "SELECT username FROM users ORDER BY rowid"
+        ).fetchall()
+        for (username,) in usernames:
+            rec = self.find_user(username)
+            if rec is not None:
+                yield rec
+
+    def iter_subjects(self):
+        codes = self.conn.execute("SELECT code FROM subjects ORDER BY rowid").fetchall()
+        for (code,) in codes:
+            rec = self.find_subject(code)
+            if rec is not None:
+                yield rec
+
+    def list_users(self) -> List[Dict[str, Any]]:
+        return self._users()
+
+    def user_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def list_users_by_role(self, role: str) -> List[Dict[str, Any]]:
+        return self._users("WHERE role = ?", (role,))
+
+    def list_subjects(self) -> List[Dict[str, Any]]:
+        return self._subjects()
+
+    def find_user(self, username: str):
+        users = self._users("WHERE username = ?", (username,))
+        return users[0] if users else None
+
+    def find_subject(self, code: str):
+        subjects = self._subjects("WHERE code = ?", (code,))
+        return subjects[0] if subjects else None
+
+    def _set_teacher_subjects(self, username: str, codes: List[str]):
+        self.conn.execute(
+            "DELETE FROM teacher_subjects WHERE username = ?", (username,)
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO teacher_subjects VALUES (?, ?, ?)",
+            [(username, code, i) for i, code in enumerate(codes)],
+        )
+
+    def _set_grades(self, username: str, grades):
+        self.conn.execute("DELETE FROM grades WHERE username = ?", (username,))
+        rows = []
+        for subject, assignments in _normalize_grades(grades).items():
+            for assignment, grade in assignments.items():
+                rows.append((username, subject, assignment, float(grade), len(rows)))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO grades VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    def _set_attendance(self, username: str, attendance):
+        self.conn.execute("DELETE FROM attendance WHERE username = ?", (username,))
+        self.conn.executemany(
+            "INSERT INTO attendance (username, subject, day) VALUES (?, ?, ?)",
+            [
+                (username, subject, day)
+                for subject, days in _normalize_attendance(attendance).items()
+                for day in _attendance_dates(days)
+            ],
+        )
+
+    def _set_students(self, code: str, students: List[str]):
+        self.conn.execute("DELETE FROM enrollments WHERE code = ?", (code,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO enrollments VALUES (?, ?, ?)",
+            [(code, username, i) for i, username in enumerate(students)],
+        )
+
+    def _insert_user(self, rec: Dict[str, Any]):
+        username = rec["username"]
+        self._delete_user(username)
+        self.conn.execute(
+            "INSERT INTO users VALUES (?, ?, ?, ?)",
+            (
+                username,
+                rec.get("password", ""),
+                rec.get("role", ""),
+                _extra(rec, USER_COLUMNS + USER_CHILDREN),
+            ),
+        )
+        if "subjects" in rec:
+            self._set_teacher_subjects(username, rec["subjects"])
+        if "grades" in rec:
+            self._set_grades(username, rec["grades"])
+        if "attendance" in rec:
+            self._set_attendance(username, rec["attendance"])
+
+    def _insert_subject(self, rec: Dict[str, Any]):
+        self.conn.execute("DELETE FROM subjects WHERE code = ?", (rec["code"],))
+        self.conn.execute(
+            "INSERT INTO subjects VALUES (?, ?, ?, ?)",
+            (
+                rec["code"],
+                rec.get("name", ""),
+                rec.get("teacher"),
+                _extra(rec, SUBJECT_COLUMNS + SUBJECT_CHILDREN),
+            ),
+        )
+        self._set_students(rec["code"], rec.get("students", []))
+
+    def _delete_user(self, username: str) -> bool:
+        cur = self.conn.execute("DELETE FROM users WHERE username = ?", (username,))
+        for table in ("teacher_subjects", "grades", "attendance"):
+            self.conn.execute(f"DELETE FROM {table} WHERE username = ?", (username,))
+        return cur.rowcount > 0
+
+    def _merge_extra(self, table: str, key: str, value: str, fields: Dict, known):
+        extra = {k: v for k, v in fields.items() if k not in known}
+        if not extra:
+            return
+        row = self.conn.execute(
+            f"SELECT extra FROM {table} WHERE {key} = ?", (value,)
+        ).fetchone()
+        merged = json.loads(row[0]) if row and row[0] else {}
+        merged.update(extra)
+        self.conn.execute(
+            f"UPDATE {table} SET extra = ? WHERE {key} = ?",
+            (json.dumps(merged), value),
+        )
+
+    def _update_user(self, username: str, fields: Dict[str, Any]) -> bool:
+        if not self.conn.execute(
+            "SELECT 1 FROM users WHERE username = ?", (username,)
+        ).fetchone():
+            return False
+
+        new_name = fields.get("username", username)
+        if new_name != username:
+            for table in ("users", "teacher_subjects", "grades", "attendance"):
+                self.conn.execute(
+                    f"UPDATE {table} SET username = ? WHERE username = ?",
+                    (new_name, username),
+                )
+            username = new_name
+
+        for column in ("password", "role"):
+            if column in fields:
+                self.conn.execute(
+                    f"UPDATE users SET {column} = ? WHERE username = ?",
+                    (fields[column], username),
+                )
+        if "subjects" in fields:
+            self._set_teacher_subjects(username, fields["subjects"])
+        if "grades" in fields:
+            self._set_grades(username, fields["grades"])
+        if "attendance" in fields:
+            self._set_attendance(username, fields["attendance"])
+        self._merge_extra(
+            "users", "username", username, fields, USER_COLUMNS + USER_CHILDREN
+        )
+        return True
+
+    def _enroll(self, code: str, usernames: List[str]) -> bool:
+        if not self.conn.execute(
+            "SELECT 1 FROM subjects WHERE code = ?", (code,)
+        ).fetchone():
+            return False
+        (start,) = self.conn.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM enrollments WHERE code = ?",
+            (code,),
+        ).fetchone()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO enrollments VALUES (?, ?, ?)",
+            [
+                (code, username, start + i)
+                for i, username in enumerate(dict.fromkeys(usernames))
+            ],
+        )
+        return True
+
+    def _roll_call(self, op: Dict[str, Any]):
+        code, day = op["code"], op["date"]
+        self.conn.executemany(
+            "DELETE FROM attendance WHERE username = ? AND subject = ? AND day = ?",
+            [(username, code, day) for username in op["absent"]],
+        )
+        self.conn.executemany(
+            "INSERT INTO attendance (username, subject, day) "
+            "SELECT ?1, ?2, ?3 WHERE EXISTS (SELECT 1 FROM users WHERE username = ?1) "
+            "AND NOT EXISTS (SELECT 1 FROM attendance "
+            "WHERE username = ?1 AND subject = ?2 AND day = ?3)",
+            [(username, code, day) for username in op["present"]],
+        )
+
+    def _set_grade(self, op: Dict[str, Any]) -> bool:
+        username = op["username"]
+        if not self.conn.execute(
+            "SELECT 1 FROM users WHERE username = ?", (username,)
+        ).fetchone():
+            return False
+        self.conn.execute(
+            "INSERT INTO grades VALUES (?, ?, ?, ?, "
+            "(SELECT COALESCE(MAX(position) + 1, 0) FROM grades WHERE username = ?)) "
+            "ON CONFLICT (username, subject, assignment) "
+            "DO UPDATE SET grade = excluded.grade",
+            (username, op["subject"], op["assignment"], op["grade"], username),
+        )
+        return True
+
+    def _update_subject(self, code: str, fields: Dict[str, Any]) -> bool:
+        if not self.conn.execute(
+            "SELECT 1 FROM subjects WHERE code = ?", (code,)
+        ).fetchone():
+            return False
+
+        new_code = fields.get("code", code)
+        if new_code != code:
+            for table in ("subjects", "enrollments"):
+                self.conn.execute(
+                    f"UPDATE {table} SET code = ? WHERE code = ?", (new_code, code)
+                )
+            code = new_code
+
+        for column in ("name", "teacher"):
+            if column in fields:
+                self.conn.execute(
+                    f"UPDATE subjects SET {column} = ? WHERE code = ?",
+                    (fields[column], code),
+                )
+        if "students" in fields:
+            self._set_students(code, fields["students"])
+        self._merge_extra(
+            "subjects", "code", code, fields, SUBJECT_COLUMNS + SUBJECT_CHILDREN
+        )
+        return True
+
+    def apply(self, op: Dict[str, Any]) -> bool:
+        kind = op["op"]
+        with self._write():
+            if kind == "add_user":
+                self._insert_user(op["record"])
+            elif kind == "add_subject":
+                self._insert_subject(op["record"])
+            elif kind == "update_user":
+                return self._update_user(op["username"], op["fields"])
+            elif kind == "update_subject":
+                return self._update_subject(op["code"], op["fields"])
+            elif kind == "enroll":
+                return self._enroll(op["code"], op["usernames"])
+            elif kind == "roll_call":
+                self._roll_call(op)
+            elif kind == "set_grade":
+                return self._set_grade(op)
+            elif kind == "delete_user":
+                return self._delete_user(op["username"])
+            else:
+                raise ValueError(f"Noma'lum amal: {kind}")
+        return True
@@ -1,9 +1,57 @@
 import json
+import logging
+import math
 import os
+import threading
+import time
+import binsnap
+import jsonstream
+import metrics
+from contextlib import contextmanager
 from typing import Dict, Any, List
-from models import Student, Teacher, Admin, Subject
+from models import AttendanceDays, Student, Teacher, Admin, Subject
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger("educational")
 
 DATA_FILE = "data.json"
+SCHEMA_VERSION = 1
+JOURNAL_FILE = "data.journal"
+JOURNAL_MODE = os.environ.get("EDU_JOURNAL", "") == "1"
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+LOCK_FILE = DATA_FILE + ".lock"
+LOCK_SLOW_SECONDS = 0.5
+STORAGE_BACKEND = os.environ.get("EDU_STORAGE", "json")
+SQLITE_FILE = "data.db"
+SHARD_DIR = "data"
+ARCHIVE_DIR = "archive"
+TERMS_FILE = "terms.json"
+STREAMING = os.environ.get("EDU_STREAMING", "") == "1"
+STUDENT_FIELDS = ("grades", "attendance")
+
+_cache = {"key": None, "data": None, "format": "json"}
+_cache_stats = {"hits": 0, "misses": 0}
+_index = {"users": {}, "subjects": {}, "roles": {}}
+_txn = {"depth": 0, "dirty": False, "ops": [], "aborted": False}
+_journal = {"seq": 0, "compactor": None}
+_journal_lock = threading.RLock()
+# the server applies write batches on a worker thread while its event loop
+# keeps reading: in-memory changes and reads are serialized by this lock,
+# commit I/O runs outside it and readers get detached copies
+_access_lock = threading.RLock()
+_lock = {"depth": 0, "file": None, "path": None}
+_archives: Dict[str, Dict[str, Any]] = {}
+_lock_stats = {
+    "acquired": 0,
+    "contended": 0,
+    "wait_total": 0.0,
+    "wait_max": 0.0,
+    "conflicts": 0,
+}
 
 
 def _ensure_file():
@@ -12,46 +60,812 @@ def _ensure_file():
             json.dump({"users": [], "subjects": []}, f)
 
 
-def load_data() -> Dict[str, Any]:
+def _stat_key(path: str):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _file_key():
+    return (
+        os.path.abspath(DATA_FILE),
+        _stat_key(DATA_FILE),
+        _stat_key(JOURNAL_FILE + ".old"),
+        _stat_key(JOURNAL_FILE),
+    )
+
+
+def _build_index(data: Dict[str, Any]):
+    users, subjects, roles = {}, {}, {}
+    for u in data.get("users", []):
+        if u["username"] in users:
+            continue
+        users[u["username"]] = u
+        roles.setdefault(u.get("role"), {})[u["username"]] = u
+    for s in data.get("subjects", []):
+        subjects.setdefault(s["code"], s)
+    _index["users"] = users
+    _index["subjects"] = subjects
+    _index["roles"] = roles
+
+
+def _index_user(u: Dict[str, Any]):
+    _index["users"].setdefault(u["username"], u)
+    if _index["users"][u["username"]] is u:
+        _index["roles"].setdefault(u.get("role"), {})[u["username"]] = u
+
+
+def _unindex_user(u: Dict[str, Any]):
+    if _index["users"].get(u["username"]) is u:
+        del _index["users"][u["username"]]
+        _index["roles"].get(u.get("role"), {}).pop(u["username"], None)
+
+
+def _grade_totals(grades) -> Dict[str, List[float]]:
+    totals = {}
+    for code, subject_grades in _normalize_grades(grades).items():
+        if subject_grades:
+            totals[code] = [math.fsum(subject_grades.values()), len(subject_grades)]
+    return totals
+
+
+def _overall_total(totals: Dict[str, List[float]]) -> List[float]:
+    return [
+        math.fsum(t[0] for t in totals.values()),
+        sum(t[1] for t in totals.values()),
+    ]
+
+
+def _shift_subject_total(subject, delta: float, added: int) -> bool:
+    if subject is None or "grade_total" not in subject:
+        return False
+    subject["grade_total"][0] += delta
+    subject["grade_total"][1] += added
+    return True
+
+
+def _retotal_user(rec: Dict, old_grades, new_grades, find_subject) -> List[Dict]:
+    old = _grade_totals(old_grades)
+    new = _grade_totals(new_grades)
+    changed = []
+    for code in list(old) + [c for c in new if c not in old]:
+        before = old.get(code, [0.0, 0])
+        after = new.get(code, [0.0, 0])
+        subject = find_subject(code)
+        if before != after and _shift_subject_total(
+            subject, after[0] - before[0], after[1] - before[1]
+        ):
+            changed.append(subject)
+    rec["grade_totals"] = new
+    rec["grade_total"] = _overall_total(new)
+    return changed
+
+
+def _set_grade(rec: Dict, subject, code: str, assignment: str, grade: float) -> bool:
+    grades = rec.setdefault("grades", {})
+    if not isinstance(grades.get(code), dict):
+        grades[code] = {}
+    old = grades[code].get(assignment)
+    grades[code][assignment] = grade
+    delta, added = (grade, 1) if old is None else (grade - old, 0)
+
+    totals = rec.get("grade_totals")
+    if totals is None:
+        rec["grade_totals"] = _grade_totals(grades)
+    else:
+        totals.setdefault(code, [0.0, 0])
+        totals[code][0] += delta
+        totals[code][1] += added
+    rec["grade_total"] = _overall_total(rec["grade_totals"])
+    return _shift_subject_total(subject, delta, added)
+
+
+def _roll_call_marks(op: Dict[str, Any]):
+    for username in op["present"]:
+        yield username, True
+    for username in op["absent"]:
+        yield username, False
+
+
+def _compact_attendance(attendance) -> Dict[str, Dict[str, str]]:
+    return {
+        code: AttendanceDays.from_value(value).to_dict()
+        for code, value in _normalize_attendance(attendance).items()
+    }
+
+
+def _attendance_dates(value) -> List[str]:
+    return list(AttendanceDays.from_value(value))
+
+
+def _mark_attendance(rec: Dict, code: str, date_str: str, present: bool) -> bool:
+    attendance = rec.get("attendance")
+    if not isinstance(attendance, dict):
+        attendance = rec["attendance"] = _normalize_attendance(attendance)
+    days = AttendanceDays.from_value(attendance.get(code, []))
+    changed = days.add(date_str) if present else days.remove(date_str)
+    if changed or code not in attendance:
+        attendance[code] = days.to_dict()
+    return changed
+
+
+def _apply_op(data: Dict[str, Any], op: Dict[str, Any]) -> bool:
+    kind = op["op"]
+    if kind == "add_user":
+        if "grades" in op["record"]:
+            _retotal_user(
+                op["record"], {}, op["record"]["grades"], _index["subjects"].get
+            )
+        data.setdefault("users", []).append(op["record"])
+        _index_user(op["record"])
+    elif kind == "add_subject":
+        data.setdefault("subjects", []).append(op["record"])
+        _index["subjects"].setdefault(op["record"]["code"], op["record"])
+    elif kind == "update_user":
+        u = _index["users"].get(op["username"])
+        if u is None:
+            return False
+        if "grades" in op["fields"]:
+            _retotal_user(
+                u, u.get("grades"), op["fields"]["grades"], _index["subjects"].get
+            )
+        _unindex_user(u)
+        u.update(op["fields"])
+        _index_user(u)
+    elif kind == "enroll":
+        s = _index["subjects"].get(op["code"])
+        if s is None:
+            return False
+        students = s.setdefault("students", [])
+        present = set(students)
+        students.extend(
+            u for u in dict.fromkeys(op["usernames"]) if u not in present
+        )
+    elif kind == "roll_call":
+        for username, present in _roll_call_marks(op):
+            u = _index["users"].get(username)
+            if u is not None:
+                _mark_attendance(u, op["code"], op["date"], present)
+    elif kind == "set_grade":
+        u = _index["users"].get(op["username"])
+        if u is None:
+            return False
+        subject = _index["subjects"].get(op["subject"])
+        _set_grade(u, subject, op["subject"], op["assignment"], op["grade"])
+    elif kind == "update_subject":
+        s = _index["subjects"].get(op["code"])
+        if s is None:
+            return False
+        s.update(op["fields"])
+        if s["code"] != op["code"]:
+            del _index["subjects"][op["code"]]
+            _index["subjects"].setdefault(s["code"], s)
+    elif kind == "delete_user":
+        users = data.get("users", [])
+        new = [u for u in users if u["username"] != op["username"]]
+        if len(new) == len(users):
+            return False
+        u = _index["users"][op["username"]]
+        if u.get("grades"):
+            _retotal_user(u, u["grades"], {}, _index["subjects"].get)
+        _unindex_user(u)
+        data["users"] = new
+    else:
+        raise ValueError(f"Noma'lum amal: {kind}")
+    return True
+
+
+def _replay_journal(path: str, data: Dict[str, Any], seq: int) -> int:
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return seq
+    with f:
+        for line in f:
+            metrics.add("storage.bytes_read", len(line))
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                break  # torn tail left by a crash mid-append
+            if rec["seq"] > seq:
+                _apply_op(data, rec)
+                seq = rec["seq"]
+                data["version"] = rec.get("version", data.get("version", 0))
+    return seq
+
+
+def _json_load() -> Dict[str, Any]:
+    if _txn["depth"] and _cache["data"] is not None:
+        _cache_stats["hits"] += 1
+        return _cache["data"]
+
+    _ensure_file()
+    key = _file_key()
+    if _cache["data"] is not None and _cache["key"] == key:
+        _cache_stats["hits"] += 1
+        return _cache["data"]
+
+    _cache_stats["misses"] += 1
+    with open(DATA_FILE, "rb") as f:
+        raw = f.read()
+    metrics.add("storage.disk_reads")
+    metrics.add("storage.bytes_read", len(raw))
+    start = time.perf_counter()
+    if raw.startswith(binsnap.MAGIC):
+        data = binsnap.loads(raw)
+        _cache["format"] = "binary"
+    else:
+        data = json.loads(raw)
+        _cache["format"] = "json"
+    metrics.add("storage.parse_seconds", time.perf_counter() - start)
+    _build_index(data)
+    seq = data.get("journal_seq", 0)
+    seq = _replay_journal(JOURNAL_FILE + ".old", data, seq)
+    _journal["seq"] = _replay_journal(JOURNAL_FILE, data, seq)
+    _cache["key"] = key
+    _cache["data"] = data
+    return data
+
+
+def _write_atomic(text, target: str = None):
+    import tempfile
+
+    path = os.path.abspath(target or DATA_FILE)
+    dirname = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(prefix=".data-", suffix=".tmp", dir=dirname)
+    try:
+        with os.fdopen(fd, "wb" if isinstance(text, bytes) else "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _wait_compaction():
+    compactor = _journal["compactor"]
+    if compactor is not None:
+        compactor.join()
+        _journal["compactor"] = None
+
+
+@contextmanager
+def _file_lock():
+    if _lock["depth"]:
+        _lock["depth"] += 1
+        try:
+            yield
+        finally:
+            _lock["depth"] -= 1
+        return
+
+    # the compactor takes the same lock on its own descriptor; let it finish
+    # first or this process would block on itself
+    _wait_compaction()
+    if fcntl is None:
+        yield
+        return
+
+    path = os.path.abspath(LOCK_FILE)
+    if _lock["path"] != path:
+        if _lock["file"] is not None:
+            _lock["file"].close()
+        _lock["file"] = open(path, "a")
+        _lock["path"] = path
+    fd = _lock["file"].fileno()
+
+    start = time.perf_counter()
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        _lock_stats["contended"] += 1
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    wait = time.perf_counter() - start
+    _lock_stats["acquired"] += 1
+    _lock_stats["wait_total"] += wait
+    _lock_stats["wait_max"] = max(_lock_stats["wait_max"], wait)
+    if wait >= LOCK_SLOW_SECONDS:
+        logger.warning("storage - %s qulfi %.3fs kutildi", LOCK_FILE, wait)
+
+    _lock["depth"] = 1
+    try:
+        yield
+    finally:
+        _lock["depth"] = 0
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def lock_stats() -> Dict[str, Any]:
+    stats = dict(_lock_stats)
+    acquired = stats["acquired"]
+    stats["wait_avg"] = stats["wait_total"] / acquired if acquired else 0.0
+    return stats
+
+
+def _snapshot_text(data: Dict[str, Any]) -> str:
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "user_count": len(data.get("users", [])),
+        "subject_count": len(data.get("subjects", [])),
+    }
+    # meta goes first so read_meta can stop after the first member
+    body = {key: value for key, value in data.items() if key != "meta"}
+    return json.dumps({"meta": meta, **body}, indent=2)
+
+
+def _encode_snapshot(data: Dict[str, Any], fmt: str = None):
+    if (fmt or _cache["format"]) == "binary":
+        return binsnap.dumps(data)
+    return _snapshot_text(data)
+
+
+def _write_snapshot(data: Dict[str, Any]):
+    with _journal_lock:
+        if _journal["seq"]:
+            data["journal_seq"] = _journal["seq"]
+        start = time.perf_counter()
+        text = _encode_snapshot(data)
+        metrics.add("storage.serialize_seconds", time.perf_counter() - start)
+        metrics.add("storage.bytes_written", len(text))
+        metrics.add("storage.disk_writes")
+        _write_atomic(text)
+        for path in (JOURNAL_FILE + ".old", JOURNAL_FILE):
+            if os.path.exists(path):
+                os.unlink(path)
+        _cache["key"] = _file_key()
+
+
+def _json_save(data: Dict[str, Any]):
+    _json_begin()
+    if data is not _cache["data"]:
+        _build_index(data)
+    _cache["data"] = data
+    _txn["dirty"] = True
+    _json_commit()
+
+
+def _journal_line(op: Dict[str, Any], version: int) -> str:
+    with _journal_lock:
+        _journal["seq"] += 1
+        rec = {"seq": _journal["seq"], "version": version, **op}
+        return json.dumps(rec, separators=(",", ":"))
+
+
+def _journal_append(lines: List[str]):
+    with _journal_lock:
+        text = "\n".join(lines) + "\n"
+        metrics.add("storage.bytes_written", len(text))
+        metrics.add("storage.disk_writes")
+        with open(JOURNAL_FILE, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        _cache["key"] = _file_key()
+        size = os.path.getsize(JOURNAL_FILE)
+    if size >= JOURNAL_COMPACT_BYTES:
+        compact(background=True)
+
+
+def _compact_files(text, target: str, old: str, snapshot_key):
+    if _stat_key(target) != snapshot_key:
+        return  # another writer already folded the rotated journal
+    _write_atomic(text, target)
+    if os.path.exists(old):
+        os.unlink(old)
+
+
+def _compact_worker(text, target: str, old: str, snapshot_key, lock_path: str):
+    # a separate descriptor, so the flock excludes this process's own
+    # writers as well as other processes; the cache key is left stale and
+    # the next access reloads under the lock
+    with open(lock_path, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        _compact_files(text, target, old, snapshot_key)
+
+
+def compact(background: bool = False):
+    with _file_lock(), _journal_lock:
+        compactor = _journal["compactor"]
+        if compactor is not None and compactor.is_alive():
+            return
+        with _access_lock:
+            data = _json_load()
+            data["journal_seq"] = _journal["seq"]
+        start = time.perf_counter()
+        text = _encode_snapshot(data)
+        metrics.add("storage.serialize_seconds", time.perf_counter() - start)
+        metrics.add("storage.bytes_written", len(text))
+        metrics.add("storage.disk_writes")
+
+        old = JOURNAL_FILE + ".old"
+        if not os.path.exists(old) and os.path.exists(JOURNAL_FILE):
+            os.replace(JOURNAL_FILE, old)
+        _cache["key"] = _file_key()
+
+        args = (
+            text,
+            os.path.abspath(DATA_FILE),
+            os.path.abspath(old),
+            _stat_key(DATA_FILE),
+        )
+        if not background:
+            _compact_files(*args)
+            _cache["key"] = _file_key()
+            return
+        _journal["compactor"] = threading.Thread(
+            target=_compact_worker,
+            args=(*args, os.path.abspath(LOCK_FILE)),
+            name="journal-compactor",
+        )
+        _journal["compactor"].start()
+
+
+def _json_mutate(op: Dict[str, Any]) -> bool:
+    _json_begin()
+    try:
+        applied = _apply_op(_json_load(), op)
+    except BaseException:
+        _json_rollback()
+        raise
+    if applied:
+        _txn["ops"].append(op)
+    _json_commit()
+    return applied
+
+
+def _json_begin():
+    _json_load()
+    _txn["depth"] += 1
+
+
+def _rebase(data: Dict[str, Any], ops: List[Dict[str, Any]], replace: bool):
+    base = data.get("version", 0)
+    invalidate_cache()
+    fresh = _json_load()
+    if fresh.get("version", 0) != base:
+        _lock_stats["conflicts"] += 1
+        logger.info(
+            "storage - versiya %s -> %s, %s amal qayta qo'llanadi",
+            base,
+            fresh.get("version", 0),
+            len(ops),
+        )
+    if replace:
+        data["version"] = fresh.get("version", 0)
+        _build_index(data)
+        _cache["data"] = data
+        return data
+    for op in ops:
+        _apply_op(fresh, op)
+    return fresh
+
+
+def _json_commit():
+    if not _txn["depth"]:
+        raise RuntimeError("Tranzaksiya ochilmagan")
+    if _txn["depth"] > 1:
+        _txn["depth"] -= 1
+        return
+    if _txn["aborted"]:
+        _json_discard()
+        raise RuntimeError("Ichki amal bekor qilingan, tranzaksiya saqlanmadi")
+
+    ops, _txn["ops"] = _txn["ops"], []
+    replace, _txn["dirty"] = _txn["dirty"], False
+    # depth stays at 1 until the write lands, so readers on other threads keep
+    # serving the cache instead of reloading a file that is being replaced
+    try:
+        if ops or replace:
+            _json_persist(ops, replace)
+    finally:
+        _txn["depth"] = 0
+
+
+def _json_persist(ops: List[Dict[str, Any]], replace: bool):
+    with _file_lock(), _journal_lock:
+        with _access_lock:
+            data = _cache["data"]
+            if _file_key() != _cache["key"]:
+                data = _rebase(data, ops, replace)
+            data["version"] = data.get("version", 0) + 1
+            snapshot = replace or not JOURNAL_MODE
+            if snapshot and _journal["seq"]:
+                data["journal_seq"] = _journal["seq"]
+        if snapshot:
+            _write_snapshot(data)
+        else:
+            _journal_append([_journal_line(op, data["version"]) for op in ops])
+
+
+def _json_discard():
+    _txn.update(depth=0, dirty=False, ops=[], aborted=False)
+    invalidate_cache()
+
+
+# a nested rollback only marks the transaction; the outermost level discards
+# it, either in its own rollback or by refusing to commit
+def _json_rollback():
+    if _txn["depth"] > 1:
+        _txn["depth"] -= 1
+        _txn["aborted"] = True
+        return
+    _json_discard()
+
+
+def _can_stream() -> bool:
+    if not STREAMING or _txn["depth"]:
+        return False
     _ensure_file()
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
+    file_key = _file_key()
+    if _cache["data"] is not None and _cache["key"] == file_key:
+        return False
+    # pending journal records need a full replay
+    return not (file_key[2] or file_key[3])
+
+
+def _json_stream(key: str):
+    if not _can_stream():
+        return None
+    if binsnap.is_binary(DATA_FILE):
+        return binsnap.iter_section(DATA_FILE, key)
+    return jsonstream.iter_array(DATA_FILE, key)
+
+
+def _stream_find(key: str, field: str, value: str):
+    if binsnap.is_binary(DATA_FILE):
+        return binsnap.find(DATA_FILE, key, value)
+    records = jsonstream.iter_array(DATA_FILE, key)
+    for rec in records:
+        if rec[field] == value:
+            records.close()
+            return rec
+    return None
+
+
+def invalidate_cache():
+    _cache["key"] = None
+    _cache["data"] = None
+
+
+def cache_stats() -> Dict[str, int]:
+    return dict(_cache_stats)
+
+
+class JsonBackend:
+    name = "json"
+
+    def load_data(self) -> Dict[str, Any]:
+        return _json_load()
+
+    def save_data(self, data: Dict[str, Any]):
+        _json_save(data)
+
+    def iter_users(self):
+        stream = _json_stream("users")
+        if stream is None:
+            return iter(_json_load().get("users", []))
+        return stream
+
+    def iter_subjects(self):
+        stream = _json_stream("subjects")
+        if stream is None:
+            return iter(_json_load().get("subjects", []))
+        return stream
+
+    def list_users(self) -> List[Dict[str, Any]]:
+        stream = _json_stream("users")
+        if stream is None:
+            return _json_load().get("users", [])
+        return list(stream)
+
+    def user_count(self) -> int:
+        meta = read_meta()
+        if meta and "user_count" in meta:
+            return meta["user_count"]
+        return len(self.list_users())
+
+    def list_users_by_role(self, role: str) -> List[Dict[str, Any]]:
+        stream = _json_stream("users")
+        if stream is None:
+            _json_load()
+            return list(_index["roles"].get(role, {}).values())
+        return [u for u in stream if u.get("role") == role]
+
+    def list_subjects(self) -> List[Dict[str, Any]]:
+        stream = _json_stream("subjects")
+        if stream is None:
+            return _json_load().get("subjects", [])
+        return list(stream)
+
+    def find_user(self, username: str):
+        if not _can_stream():
+            _json_load()
+            return _index["users"].get(username)
+        return _stream_find("users", "username", username)
+
+    def find_subject(self, code: str):
+        if not _can_stream():
+            _json_load()
+            return _index["subjects"].get(code)
+        return _stream_find("subjects", "code", code)
+
+    def apply(self, op: Dict[str, Any]) -> bool:
+        return _json_mutate(op)
+
+    def begin(self):
+        _json_begin()
+
+    def commit(self):
+        _json_commit()
+
+    def rollback(self):
+        _json_rollback()
+
+    def close(self):
+        pass
+
+
+_backend = {"key": None, "impl": None}
+
+
+def _make_backend(name: str, path: str = None):
+    if name == "json":
+        return JsonBackend()
+    if name == "sqlite":
+        from sqlite_backend import SqliteBackend
+
+        return SqliteBackend(path or SQLITE_FILE)
+    if name == "sharded":
+        from sharded_backend import ShardedBackend
+
+        return ShardedBackend(path or SHARD_DIR)
+    raise ValueError(f"Noma'lum saqlash turi: {name}")
+
+
+def get_backend():
+    key = (STORAGE_BACKEND, DATA_FILE, SQLITE_FILE, SHARD_DIR)
+    if _backend["key"] != key:
+        if _backend["impl"] is not None:
+            _backend["impl"].close()
+        _backend["impl"] = _make_backend(STORAGE_BACKEND)
+        _backend["key"] = key
+    return _backend["impl"]
+
+
+def load_data() -> Dict[str, Any]:
+    metrics.add("storage.load_data")
+    with _access_lock:
+        return get_backend().load_data()
 
 
 def save_data(data: Dict[str, Any]):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    metrics.add("storage.save_data")
+    with _access_lock:
+        get_backend().save_data(data)
+
+
+def begin():
+    get_backend().begin()
+
+
+def commit():
+    get_backend().commit()
+
+
+def rollback():
+    get_backend().rollback()
+
+
+@contextmanager
+def transaction():
+    backend = get_backend()
+    with _access_lock:
+        backend.begin()
+        try:
+            yield
+        except BaseException:
+            backend.rollback()
+            raise
+    backend.commit()
+
+
+def iter_users():
+    return get_backend().iter_users()
+
+
+def iter_subjects():
+    return get_backend().iter_subjects()
+
+
+def read_meta():
+    if STORAGE_BACKEND != "json":
+        return None
+    data = _cache["data"]
+    if data is not None and _cache["key"] == _file_key():
+        return {
+            "schema_version": SCHEMA_VERSION,
+            "user_count": len(data.get("users", [])),
+            "subject_count": len(data.get("subjects", [])),
+        }
+    if os.path.exists(JOURNAL_FILE) or os.path.exists(JOURNAL_FILE + ".old"):
+        return None  # counts in the header predate the journal
+    try:
+        counts = binsnap.read_header(DATA_FILE)
+        if counts is None:
+            return jsonstream.read_header(DATA_FILE, "meta")
+    except (FileNotFoundError, ValueError):
+        return None
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "user_count": counts["users"],
+        "subject_count": counts["subjects"],
+    }
+
+
+def user_count() -> int:
+    # counting must not create an empty store as a side effect
+    paths = {"json": DATA_FILE, "sqlite": SQLITE_FILE, "sharded": SHARD_DIR}
+    if not os.path.exists(paths.get(STORAGE_BACKEND, "")):
+        return 0
+    return get_backend().user_count()
+
+
+def _detached(value):
+    if isinstance(value, dict):
+        return {key: _detached(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_detached(item) for item in value]
+    return value
 
 
 def list_users() -> List[Dict[str, Any]]:
-    data = load_data()
-    return data.get("users", [])
+    with _access_lock:
+        return _detached(get_backend().list_users())
+
+
+def list_users_by_role(role: str) -> List[Dict[str, Any]]:
+    with _access_lock:
+        return _detached(
+            get_backend().list_users_by_role(role.strip().capitalize())
+        )
 
 
 def list_subjects() -> List[Dict[str, Any]]:
-    data = load_data()
-    return data.get("subjects", [])
+    with _access_lock:
+        return _detached(get_backend().list_subjects())
 
 
 def find_user(username: str):
-    users = list_users()
-    for u in users:
-        if u["username"] == username:
-            return u
-    return None
+    with _access_lock:
+        return _detached(get_backend().find_user(username))
 
 
 def find_subject(code: str):
-    subjects = list_subjects()
-    for s in subjects:
-        if s["code"] == code:
-            return s
-    return None
+    with _access_lock:
+        return _detached(get_backend().find_subject(code))
 
 
-def add_user(user_obj):
-    data = load_data()
-    users = data.get("users", [])
+def apply(op: Dict[str, Any]) -> bool:
+    with transaction():
+        return get_backend().apply(op)
+
+
+def user_record(user_obj) -> Dict[str, Any]:
     entry = {
         "username": user_obj.username,
         "password": getattr(user_obj, "_password"),
@@ -62,52 +876,272 @@ def add_user(user_obj):
         entry["subjects"] = getattr(user_obj, "subjects", [])
     elif user_obj.role == "Student":
         entry["grades"] = getattr(user_obj, "_grades", {})
-        entry["attendance"] = getattr(user_obj, "_attendance", {})
+        entry["attendance"] = {
+            code: days.to_dict() for code, days in user_obj.attendance_books().items()
+        }
+    return entry
+
+
+def add_user(user_obj):
+    apply({"op": "add_user", "record": user_record(user_obj)})
+
 
-    users.append(entry)
-    data["users"] = users
-    save_data(data)
+def subject_record(subject: Subject) -> Dict[str, Any]:
+    entry = subject.to_dict()
+    entry["grade_total"] = [0.0, 0]
+    return entry
 
 
 def add_subject(subject: Subject):
-    data = load_data()
-    subjects = data.get("subjects", [])
-    subjects.append(subject.to_dict())
-    data["subjects"] = subjects
-    save_data(data)
+    apply({"op": "add_subject", "record": subject_record(subject)})
 
 
 def update_subject(code: str, fields: Dict):
-    data = load_data()
-    subjects = data.get("subjects", [])
-    for s in subjects:
-        if s["code"] == code:
-            s.update(fields)
-            save_data(data)
-            return True
-    return False
+    return apply({"op": "update_subject", "code": code, "fields": fields})
 
 
 def delete_user(username: str) -> bool:
-    data = load_data()
-    users = data.get("users", [])
-    new = [u for u in users if u["username"] != username]
-    if len(new) == len(users):
-        return False
-    data["users"] = new
-    save_data(data)
-    return True
+    return apply({"op": "delete_user", "username": username})
 
 
 def update_user(username: str, fields: Dict):
-    data = load_data()
-    users = data.get("users", [])
-    for u in users:
-        if u["username"] == username:
-            u.update(fields)
-            save_data(data)
-            return True
-    return False
+    if "attendance" in fields:
+        fields = dict(fields, attendance=_compact_attendance(fields["attendance"]))
+    return apply({"op": "update_user", "username": username, "fields": fields})
+
+
+def enroll(subject_code: str, usernames: List[str]) -> bool:
+    return apply({"op": "enroll", "code": subject_code, "usernames": usernames})
+
+
+def roll_call(subject_code: str, date_str: str, present: List[str], absent: List[str]):
+    return apply(
+        {
+            "op": "roll_call",
+            "code": subject_code,
+            "date": date_str,
+            "present": present,
+            "absent": absent,
+        }
+    )
+
+
+def set_grade(username: str, subject_code: str, assignment: str, grade: float):
+    return apply(
+        {
+            "op": "set_grade",
+            "username": username,
+            "subject": subject_code,
+            "assignment": assignment,
+            "grade": float(grade),
+        }
+    )
+
+
+def _totals_match(stored, expected, tolerance: float = 1e-6) -> bool:
+    if not isinstance(stored, list) or len(stored) != 2:
+        return False
+    return stored[1] == expected[1] and abs(stored[0] - expected[0]) <= tolerance
+
+
+def verify_aggregates(fix: bool = False) -> List[str]:
+    drift = []
+    user_fixes = {}
+    subject_sums: Dict[str, List[float]] = {}
+
+    for rec in iter_users():
+        if "grades" not in rec:
+            continue
+        totals = _grade_totals(rec["grades"])
+        for code, (total, count) in totals.items():
+            subject_sums.setdefault(code, [])
+            subject_sums[code].append((total, count))
+
+        stored = rec.get("grade_totals")
+        if not isinstance(stored, dict):
+            stored = {}
+        bad = [
+            code
+            for code in set(stored) | set(totals)
+            if not _totals_match(stored.get(code), totals.get(code, [0.0, 0]))
+        ]
+        overall = _overall_total(totals)
+        if bad or not _totals_match(rec.get("grade_total"), overall):
+            drift.append(
+                f"{rec['username']}: {', '.join(sorted(bad)) or 'umumiy'}"
+                f" (kutilgan {overall[0]:.4f}/{overall[1]})"
+            )
+            user_fixes[rec["username"]] = {
+                "grade_totals": totals,
+                "grade_total": overall,
+            }
+
+    subject_fixes = {}
+    for subject in iter_subjects():
+        parts = subject_sums.get(subject["code"], [])
+        expected = [math.fsum(p[0] for p in parts), sum(p[1] for p in parts)]
+        if not _totals_match(subject.get("grade_total"), expected):
+            drift.append(
+                f"[{subject['code']}]: {subject.get('grade_total')}"
+                f" (kutilgan {expected[0]:.4f}/{expected[1]})"
+            )
+            subject_fixes[subject["code"]] = {"grade_total": expected}
+
+    if fix and (user_fixes or subject_fixes):
+        with transaction():
+            for username, fields in user_fixes.items():
+                update_user(username, fields)
+            for code, fields in subject_fixes.items():
+                update_subject(code, fields)
+    return drift
+
+
+def migrate(target_name: str, path: str = None) -> Dict[str, int]:
+    data = _json_load()
+    target = _make_backend(target_name, path)
+    try:
+        target.save_data(data)
+    finally:
+        target.close()
+    return {
+        "users": len(data.get("users", [])),
+        "subjects": len(data.get("subjects", [])),
+    }
+
+
+def convert(fmt: str, out: str = None) -> Dict[str, int]:
+    if fmt not in ("json", "binary"):
+        raise ValueError(f"Noma'lum format: {fmt}")
+    with _file_lock():
+        data = _json_load()
+        if out is None:
+            _cache["format"] = fmt
+            _write_snapshot(data)
+        else:
+            _write_atomic(_encode_snapshot(data, fmt), out)
+    target = out or DATA_FILE
+    return {
+        "users": len(data.get("users", [])),
+        "subjects": len(data.get("subjects", [])),
+        "bytes": os.path.getsize(target),
+    }
+
+
+def _archive_path(name: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"term_{name}.json")
+
+
+def list_terms() -> List[Dict[str, Any]]:
+    path = os.path.join(ARCHIVE_DIR, TERMS_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def close_term(name: str) -> Dict[str, int]:
+    name = name.strip()
+    if not name or not all(c.isalnum() or c in "-_" for c in name):
+        raise ValueError("Semestr nomi: faqat harf, raqam, '-' va '_'")
+    terms = list_terms()
+    if any(term["name"] == name for term in terms):
+        raise ValueError(f"Semestr allaqachon yopilgan: {name}")
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = _archive_path(name)
+    closed = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with transaction():
+        students = [
+            {
+                "username": rec["username"],
+                "grades": _normalize_grades(rec.get("grades")),
+                "attendance": _compact_attendance(rec.get("attendance")),
+            }
+            for rec in list_users_by_role("Student")
+            if rec.get("grades") or rec.get("attendance")
+        ]
+        subjects = [
+            {
+                "code": s["code"],
+                "name": s["name"],
+                "teacher": s.get("teacher"),
+                "students": list(s.get("students", [])),
+            }
+            for s in list_subjects()
+        ]
+        segment = {
+            "term": name,
+            "closed": closed,
+            "users": students,
+            "subjects": subjects,
+        }
+        # a segment is never rewritten, so it is left read-only on disk
+        _write_atomic(_encode_snapshot(segment), path)
+        os.chmod(path, 0o444)
+        for rec in students:
+            update_user(rec["username"], {"grades": {}, "attendance": {}})
+
+    terms.append({"name": name, "closed": closed, "file": os.path.basename(path)})
+    _write_atomic(json.dumps(terms, indent=2), os.path.join(ARCHIVE_DIR, TERMS_FILE))
+    return {"students": len(students), "subjects": len(subjects)}
+
+
+def _term_entry(name: str) -> Dict[str, Any]:
+    path = _archive_path(name)
+    key = _stat_key(path)
+    if key is None:
+        raise ValueError(f"Arxiv topilmadi: {name}")
+    entry = _archives.get(path)
+    if entry is None or entry["key"] != key:
+        with open(path, "rb") as f:
+            raw = f.read()
+        metrics.add("storage.disk_reads")
+        metrics.add("storage.bytes_read", len(raw))
+        if raw.startswith(binsnap.MAGIC):
+            data = binsnap.loads(raw)
+        else:
+            data = json.loads(raw)
+        entry = _archives[path] = {
+            "key": key,
+            "data": data,
+            "users": {u["username"]: u for u in data.get("users", [])},
+            "subjects": {s["code"]: s for s in data.get("subjects", [])},
+        }
+    return entry
+
+
+def load_term(name: str) -> Dict[str, Any]:
+    return _term_entry(name)["data"]
+
+
+def term_record(name: str, section: str, key: str):
+    path = _archive_path(name)
+    if path not in _archives and binsnap.is_binary(path):
+        return binsnap.find(path, section, key)
+    return _term_entry(name)[section].get(key)
+
+
+def transcript(username: str) -> List[Dict[str, Any]]:
+    entries = []
+    for term in list_terms():
+        rec = term_record(term["name"], "users", username)
+        if rec is None:
+            continue
+        names = {}
+        for code in rec.get("grades", {}):
+            subject = term_record(term["name"], "subjects", code)
+            names[code] = subject["name"] if subject else code
+        entries.append(
+            {
+                "term": term["name"],
+                "closed": term["closed"],
+                "grades": rec.get("grades", {}),
+                "attendance": rec.get("attendance", {}),
+                "subject_names": names,
+            }
+        )
+    return entries
 
 
 def _normalize_grades(grades_data):
@@ -136,7 +1170,7 @@ def _normalize_attendance(attendance_data):
     if isinstance(attendance_data, dict):
         normalized = {}
         for key, value in attendance_data.items():
-            if isinstance(value, list):
+            if isinstance(value, (list, dict)):
                 normalized[key] = value
         return normalized
     elif isinstance(attendance_data, list):
@@ -144,13 +1178,23 @@ def _normalize_attendance(attendance_data):
     return {}
 
 
-def instantiate_user_from_record(rec: Dict):
+def instantiate_user_from_record(rec: Dict, subjects=None, fields=None):
     role = rec.get("role", "").capitalize()
 
     if role == "Student":
         s = Student(rec["username"], rec["password"])
-        s._grades = _normalize_grades(rec.get("grades", {}))
-        s._attendance = _normalize_attendance(rec.get("attendance", {}))
+        fields = STUDENT_FIELDS if fields is None else fields
+        grades = attendance = total = None
+        # normalizing is shallow; per-subject books are built on first access
+        if "grades" in fields:
+            grades = _normalize_grades(rec.get("grades"))
+            total = rec.get("grade_total")
+        if "attendance" in fields:
+            attendance = _normalize_attendance(rec.get("attendance"))
+        s.defer(grades, attendance, total)
+        for code in subjects or ():
+            s.gradebook(code)
+            s.attendance_days(code)
         return s
     elif role == "Teacher":
         t = Teacher(rec["username"], rec["password"])
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import storage  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "json")
+    monkeypatch.setattr(storage, "JOURNAL_MODE", False)
+    monkeypatch.setattr(storage, "STREAMING", False)
+    storage.invalidate_cache()
+    storage._index.update(users={}, subjects={}, roles={})
+    storage._txn.update(depth=0, dirty=False, ops=[], aborted=False)
+    storage._journal["seq"] = 0
+    storage._archives.clear()
+    yield tmp_path
+    if storage._backend["impl"] is not None:
+        storage._backend["impl"].close()
+    storage._backend.update(key=None, impl=None)
+    storage.invalidate_cache()
+
+
+def run_workers(cwd, script: str, args_list, env=None):
+    env = dict(os.environ, PYTHONPATH=ROOT, **(env or {}))
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", script, *map(str, args)], cwd=cwd, env=env
+        )
+        for args in args_list
+    ]
+    for proc in procs:
+        assert proc.wait(timeout=300) == 0
@@ -0,0 +1,45 @@
+from models import AttendanceDays
+
+
+def test_add_remove_contains():
+    days = AttendanceDays(["2026-01-15", "2026-01-10"])
+    assert "2026-01-10" in days and "2026-01-15" in days
+    assert not days.add("2026-01-10")
+    assert days.remove("2026-01-10")
+    assert not days.remove("2026-01-10")
+    assert "2026-01-10" not in days
+    assert list(days) == ["2026-01-15"]
+    assert len(days) == 1
+
+
+def test_to_dict_drops_cleared_low_days():
+    days = AttendanceDays(["2025-09-01", "2026-01-15"])
+    days.remove("2025-09-01")
+    assert days.to_dict() == {"start": "2026-01-15", "bits": "1"}
+
+
+def test_to_dict_normalizes_stored_bloat():
+    days = AttendanceDays.from_value({"start": "2025-04-18", "bits": "1" + "0" * 68})
+    assert days.to_dict()["bits"] == "1"
+    assert list(days) == ["2026-01-15"]
+
+
+def test_empty_resets_base():
+    days = AttendanceDays(["2026-01-15"])
+    days.remove("2026-01-15")
+    assert days.base is None
+    assert days.to_dict() == {"start": None, "bits": "0"}
+    assert days.add("2026-02-01")
+    assert days.to_dict() == {"start": "2026-02-01", "bits": "1"}
+
+
+def test_round_trip_and_union():
+    a = AttendanceDays(["2026-01-01", "2026-01-03"])
+    b = AttendanceDays.from_value(
+        AttendanceDays(["2026-01-02", "2026-03-01"]).to_dict()
+    )
+    merged = a.union(b)
+    assert list(merged) == ["2026-01-01", "2026-01-02", "2026-01-03", "2026-03-01"]
+    assert AttendanceDays.from_value(merged.to_dict()).bits == merged.bits
+    assert a.rate(merged) == 0.5
+    assert merged.count_between("2026-01-02", "2026-01-31") == 2
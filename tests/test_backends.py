@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+import storage
+from models import AttendanceDays, Student, Subject, Teacher
+
+BACKENDS = ["json", "sqlite", "sharded"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_user_count_does_not_create_store(workdir, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+    assert storage.user_count() == 0
+    assert os.listdir(workdir) == []
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_user_count_matches_list_users(workdir, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+    for i in range(3):
+        storage.add_user(Student(f"s{i}", "p"))
+    storage.delete_user("s1")
+    assert storage.user_count() == len(storage.list_users()) == 2
+
+
+def _run_ops():
+    storage.add_subject(Subject("Matematika", "MATH"))
+    storage.add_subject(Subject("Fizika", "PHYS"))
+    storage.add_user(Teacher("t1", "p"))
+    for i in range(4):
+        storage.add_user(Student(f"s{i}", "p"))
+    storage.enroll("MATH", ["s0", "s1", "s2"])
+    storage.enroll("PHYS", ["s2", "s3"])
+    storage.update_subject("MATH", {"teacher": "t1"})
+    storage.update_user("t1", {"subjects": ["MATH"]})
+    with storage.transaction():
+        storage.set_grade("s0", "MATH", "t1", 80)
+        storage.set_grade("s1", "MATH", "t1", 92.5)
+        storage.set_grade("s2", "PHYS", "lab", 70)
+    storage.set_grade("s0", "MATH", "t1", 85)
+    storage.roll_call("MATH", "2026-01-15", ["s0", "s2"], ["s1"])
+    storage.roll_call("MATH", "2026-01-16", ["s1"], ["s0", "s2"])
+    storage.delete_user("s3")
+
+
+def _snapshot():
+    storage.invalidate_cache()
+    users = []
+    for user in sorted(storage.list_users(), key=lambda u: u["username"]):
+        # SQLite keeps attendance as day rows, the file backends as bitsets
+        if "attendance" in user:
+            user = dict(
+                user,
+                attendance={
+                    code: list(AttendanceDays.from_value(days))
+                    for code, days in user["attendance"].items()
+                },
+            )
+        users.append(user)
+    subjects = sorted(storage.list_subjects(), key=lambda s: s["code"])
+    return users, subjects
+
+
+def test_backends_agree_on_the_same_ops(workdir, monkeypatch):
+    results = {}
+    for backend in BACKENDS:
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+        _run_ops()
+        results[backend] = _snapshot()
+
+    assert results["sqlite"] == results["json"]
+    assert results["sharded"] == results["json"]
+    assert storage.verify_aggregates() == []
+
+
+@pytest.mark.parametrize("target", ["sqlite", "sharded"])
+def test_migrate_preserves_records(workdir, monkeypatch, target):
+    _run_ops()
+    expected = _snapshot()
+    storage.migrate(target)
+
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", target)
+    assert _snapshot() == expected
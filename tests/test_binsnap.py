@@ -0,0 +1,62 @@
+import pytest
+
+import binsnap
+import storage
+from models import Student, Subject
+
+DATA = {
+    "meta": {"schema_version": 1},
+    "version": 7,
+    "journal_seq": 3,
+    "users": [
+        {"username": "bek", "role": "Student", "grades": {"MATH": {"t1": 85.0}}},
+        {"username": "ali", "role": "Teacher", "subjects": ["MATH"]},
+        {"username": "o'g'il", "role": "Student", "grades": {}},
+        {"username": "ali", "role": "Admin"},
+    ],
+    "subjects": [{"code": "MATH", "name": "Matematika", "students": ["bek"]}],
+}
+
+
+def test_round_trip_drops_only_meta():
+    expected = {k: v for k, v in DATA.items() if k != "meta"}
+    assert binsnap.loads(binsnap.dumps(DATA)) == expected
+
+
+def test_empty_sections_round_trip():
+    assert binsnap.loads(binsnap.dumps({})) == {"users": [], "subjects": []}
+
+
+def test_mmap_lookup(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_bytes(binsnap.dumps(DATA))
+
+    assert binsnap.is_binary(str(path))
+    assert binsnap.read_header(str(path)) == {"users": 4, "subjects": 1}
+    assert binsnap.find(str(path), "users", "bek") == DATA["users"][0]
+    assert binsnap.find(str(path), "users", "o'g'il") == DATA["users"][2]
+    # duplicates resolve to the first record, like the in-memory index
+    assert binsnap.find(str(path), "users", "ali") == DATA["users"][1]
+    assert binsnap.find(str(path), "users", "zzz") is None
+    assert binsnap.find(str(path), "subjects", "MATH") == DATA["subjects"][0]
+    assert list(binsnap.iter_section(str(path), "users")) == DATA["users"]
+
+
+def test_rejects_foreign_and_truncated_files():
+    with pytest.raises(ValueError):
+        binsnap.loads(b'{"users": []}')
+    with pytest.raises(ValueError):
+        binsnap.loads(binsnap.dumps(DATA)[:-10])
+
+
+def test_storage_reads_a_converted_snapshot(workdir):
+    storage.add_subject(Subject("Matematika", "MATH"))
+    storage.add_user(Student("s1", "p"))
+    storage.set_grade("s1", "MATH", "t1", 90)
+    before = storage.load_data()["users"]
+
+    storage.convert("binary")
+    storage.invalidate_cache()
+    assert binsnap.is_binary(storage.DATA_FILE)
+    assert storage.load_data()["users"] == before
+    assert storage.user_count() == 1
@@ -0,0 +1,74 @@
+import pytest
+
+import storage
+from conftest import run_workers
+from models import Student, Subject
+
+WORKERS = 4
+GRADES = 200
+
+SET_GRADES = f"""
+import sys
+import storage
+
+storage.JOURNAL_COMPACT_BYTES = 2000
+for i in range({GRADES}):
+    storage.set_grade("s" + sys.argv[1], "MATH", f"t{{i}}", 50)
+"""
+
+
+def _setup():
+    storage.add_subject(Subject("Matematika", "MATH"))
+    for i in range(WORKERS):
+        storage.add_user(Student(f"s{i}", "p"))
+    storage.enroll("MATH", [f"s{i}" for i in range(WORKERS)])
+
+
+@pytest.mark.parametrize("journal", ["", "1"], ids=["snapshot", "journal"])
+def test_parallel_set_grade_loses_nothing(workdir, journal):
+    _setup()
+    run_workers(
+        workdir,
+        SET_GRADES,
+        [[i] for i in range(WORKERS)],
+        env={"EDU_JOURNAL": journal},
+    )
+
+    storage.invalidate_cache()
+    counts = [
+        len(storage.find_user(f"s{i}")["grades"]["MATH"]) for i in range(WORKERS)
+    ]
+    assert counts == [GRADES] * WORKERS
+    assert storage.find_subject("MATH")["grade_total"] == [
+        50.0 * GRADES * WORKERS,
+        GRADES * WORKERS,
+    ]
+    assert storage.verify_aggregates() == []
+
+
+GRADE_OR_ENROLL = f"""
+import sys
+import storage
+
+for i in range({GRADES}):
+    if sys.argv[1] == "grade":
+        storage.set_grade("s0", "MATH", f"t{{i}}", 1)
+    else:
+        storage.enroll("MATH", [f"e{{sys.argv[1]}}_{{i}}"])
+"""
+
+
+def test_sharded_grader_and_enrollers_do_not_clobber(workdir, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "sharded")
+    _setup()
+    run_workers(
+        workdir,
+        GRADE_OR_ENROLL,
+        [["grade"], [0], [1]],
+        env={"EDU_STORAGE": "sharded"},
+    )
+
+    subject = storage.find_subject("MATH")
+    assert len(subject["students"]) == WORKERS + 2 * GRADES
+    assert subject["grade_total"] == [float(GRADES), GRADES]
+    assert len(storage.find_user("s0")["grades"]["MATH"]) == GRADES
@@ -0,0 +1,24 @@
+import logging
+
+import pytest
+
+import decorators
+
+
+def test_log_action_logs_entry_before_the_call_finishes(caplog):
+    seen = []
+
+    @decorators.log_action
+    def menu():
+        seen.extend(r.outcome for r in caplog.records)
+        raise KeyboardInterrupt
+
+    with caplog.at_level(logging.INFO, logger="educational"):
+        with pytest.raises(KeyboardInterrupt):
+            menu()
+
+    assert seen == ["start"]
+    assert [r.outcome for r in caplog.records] == ["start", "KeyboardInterrupt"]
+    assert caplog.records[0].getMessage() == "anonim - menu boshlandi"
+    assert caplog.records[0].duration is None
+    assert caplog.records[1].duration >= 0
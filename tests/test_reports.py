@@ -0,0 +1,26 @@
+import statistics
+
+import pytest
+
+import reports
+import storage
+
+# grades are stored as floats; 0.1 + 0.2 + 0.3 summed one by one gives
+# 0.20000000000000004 as the average while statistics.mean gives 0.2
+GRADES = [
+    {"MATH": {"a": 80.0, "b": 90.0}},
+    {"MATH": {"a": 0.1, "b": 0.2}, "PHYS": {"c": 0.3}},
+    {"MATH": {}},
+]
+
+
+@pytest.mark.parametrize("grades", GRADES)
+def test_student_report_average_matches_statistics_mean(grades):
+    student = storage.instantiate_user_from_record(
+        {"username": "s1", "password": "", "role": "Student", "grades": grades}
+    )
+    values = [g for subject in grades.values() for g in subject.values()]
+    expected = statistics.mean(values) if values else None
+
+    text = reports.render_student_report(student, {})
+    assert f"Umumiy o'rtacha: {expected or 'N/A'}\n" in text
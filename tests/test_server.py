@@ -0,0 +1,140 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+import server
+import storage
+from models import Admin, Student, Subject, Teacher
+
+GRADERS = 20
+ROUNDS = 15
+
+
+def _run(*requests):
+    async def go():
+        writer = server.Writer()
+        task = asyncio.create_task(writer.run())
+        try:
+            return [
+                await server.handle_request(writer, json.dumps(r).encode())
+                for r in requests
+            ]
+        finally:
+            task.cancel()
+
+    return asyncio.run(go())
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_writes_are_applied_off_the_event_loop(workdir, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+    storage.add_user(Admin("admin", "p"))
+    responses = _run(
+        {"cmd": "login", "args": {"username": "admin", "password": "p"}},
+        {"cmd": "create_subject", "args": {"code": "math", "name": "Matematika"}},
+        {
+            "cmd": "create_user",
+            "args": {"username": "s1", "password": "p", "role": "Student"},
+        },
+        {"cmd": "enroll", "args": {"code": "MATH", "usernames": ["s1"]}},
+    )
+    assert all(r["ok"] for r in responses), responses
+    assert storage.find_subject("MATH")["students"] == ["s1"]
+
+
+@pytest.mark.parametrize("usernames", ["s1", ["s1", 1], {"s1": 1}])
+def test_enroll_rejects_non_list_usernames(workdir, usernames):
+    storage.add_user(Admin("admin", "p"))
+    responses = _run(
+        {"cmd": "login", "args": {"username": "admin", "password": "p"}},
+        {"cmd": "enroll", "args": {"code": "MATH", "usernames": usernames}},
+    )
+    assert responses[1] == {
+        "ok": False,
+        "error": "usernames satrlar ro'yxati bo'lishi kerak",
+        "code": "invalid",
+    }
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_failed_op_in_batch_does_not_drop_the_others(workdir, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+    record = storage.user_record(Admin("a2", "p"))
+    batch = [
+        ([{"op": "add_user", "record": record}], None, None),
+        ([{"op": "no_such_op"}], None, None),
+    ]
+    results = server.Writer()._apply_batch(batch)
+
+    assert results[0] == (True, [True])
+    assert isinstance(results[1][1], ValueError)
+    assert storage.find_user("a2") is not None
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_reads_while_write_batches_run(workdir, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+    storage.add_user(Admin("admin", "p"))
+    storage.add_user(Teacher("t1", "p"))
+    storage.update_user("t1", {"subjects": ["MATH"]})
+    storage.add_subject(Subject("Matematika", "MATH"))
+    names = [f"s{i}" for i in range(GRADERS)]
+    for name in names:
+        storage.add_user(Student(name, "p"))
+    storage.enroll("MATH", names)
+
+    async def go():
+        writer = server.Writer()
+        writer_task = asyncio.create_task(writer.run())
+        graders_done = []
+
+        async def call(cmd, **args):
+            line = json.dumps({"cmd": cmd, "args": args}).encode()
+            response = await server.handle_request(writer, line)
+            json.dumps(response)  # what the connection handler sends
+            assert response["ok"], response
+            return response
+
+        async def grader(name):
+            await call("login", username="t1", password="p")
+            for i in range(ROUNDS):
+                await call(
+                    "set_grade",
+                    code="MATH",
+                    username=name,
+                    assignment=f"a{i}",
+                    grade=50,
+                )
+            graders_done.append(name)
+
+        async def reader(username, cmd, args):
+            await call("login", username=username, password="p")
+            reads = 0
+            while len(graders_done) < len(names):
+                await call(cmd, **args)
+                reads += 1
+            return reads
+
+        tasks = [asyncio.create_task(grader(name)) for name in names]
+        tasks.append(asyncio.create_task(reader("admin", "users", {})))
+        tasks.append(
+            asyncio.create_task(reader("t1", "subject_stats", {"code": "MATH"}))
+        )
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            writer_task.cancel()
+
+    # switch threads often so reads land in the middle of a batch
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        reads = asyncio.run(go())[-2:]
+    finally:
+        sys.setswitchinterval(switch)
+    assert all(reads)
+    storage.invalidate_cache()
+    graded = sum(len(storage.find_user(n)["grades"]["MATH"]) for n in names)
+    assert graded == GRADERS * ROUNDS
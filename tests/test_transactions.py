@@ -0,0 +1,45 @@
+import pytest
+
+import storage
+from models import Student
+
+BACKENDS = ["json", "sqlite", "sharded"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, workdir, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", request.param)
+    return request.param
+
+
+def _usernames():
+    storage.invalidate_cache()
+    return sorted(u["username"] for u in storage.list_users())
+
+
+def test_nested_failure_keeps_outer_open_and_aborts_it(backend):
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.add_user(Student("a", "p"))
+            with pytest.raises(ValueError):
+                with storage.transaction():
+                    storage.add_user(Student("b", "p"))
+                    raise ValueError("ichki")
+            storage.add_user(Student("c", "p"))
+
+    assert _usernames() == []
+    storage.add_user(Student("d", "p"))
+    assert _usernames() == ["d"]
+
+
+def test_error_through_both_levels_rolls_back_once(backend):
+    with pytest.raises(ValueError):
+        with storage.transaction():
+            storage.add_user(Student("a", "p"))
+            with storage.transaction():
+                raise ValueError("ichki")
+
+    assert _usernames() == []
+    with storage.transaction():
+        storage.add_user(Student("b", "p"))
+    assert _usernames() == ["b"]
@@ -1,9 +1,9 @@
 import os
-import csv
-import statistics
+import datetime
 import time
 import session
 import decorators
+import metrics
 
 from utils import pause, clear, header
 from termcolor import colored
@@ -12,14 +12,21 @@ from storage import (
     add_subject,
     find_subject,
     list_subjects,
-    list_users,
+    list_users_by_role,
     find_user,
     add_user,
     instantiate_user_from_record,
     update_subject,
     update_user,
+    set_grade,
+    enroll,
+    roll_call,
     delete_user,
-    load_data,
+    user_count,
+    transaction,
+    list_terms,
+    close_term,
+    transcript,
 )
 
 
@@ -36,9 +43,10 @@ def authenticate():
         return None
 
     password = input(colored("Parol: ", "cyan"))
-    user_obj = instantiate_user_from_record(user_rec)
+    user_obj = instantiate_user_from_record(user_rec, fields=())
 
     if user_obj and user_obj.authenticate(password):
+        user_obj = instantiate_user_from_record(user_rec)
         session.current_user = user_obj
         print(colored(f"\n✓ Xush kelibsiz: {user_obj.username}", "green"))
         time.sleep(1)
@@ -50,8 +58,7 @@ def authenticate():
 
 
 def ensure_admin():
-    data = load_data()
-    if not data.get("users"):
+    if not user_count():
         add_user(Admin("admin", "admin"))
 
 
@@ -103,6 +110,8 @@ def admin_menu(admin: Admin):
         "6": remove_user,
         "7": reset_password,
         "8": view_logs,
+        "9": view_metrics,
+        "10": close_current_term,
     }
 
     while True:
@@ -116,12 +125,14 @@ def admin_menu(admin: Admin):
         print(colored("6. User o'chirish", "cyan"))
         print(colored("7. Parol", "cyan"))
         print(colored("8. Loglar", "cyan"))
-        print(colored("9. Chiqish", "cyan"))
+        print(colored("9. Metrikalar", "cyan"))
+        print(colored("10. Semestrni yopish", "cyan"))
+        print(colored("11. Chiqish", "cyan"))
 
         choice = input(colored("\n> ", "cyan")).strip()
 
         match choice:
-            case "9":
+            case "11":
                 session.current_user = None
                 break
             case _ if choice in actions:
@@ -132,6 +143,7 @@ def admin_menu(admin: Admin):
                 time.sleep(1)
 
 
+@decorators.timed
 def create_user():
     clear()
     header("YANGI USER")
@@ -164,6 +176,7 @@ def create_user():
     print(colored(f"\n✓ Yaratildi: {uname} ({role})", "green"))
 
 
+@decorators.timed
 def create_subject():
     clear()
     header("YANGI FAN")
@@ -180,6 +193,7 @@ def create_subject():
     print(colored(f"\n✓ Yaratildi: {name} ({code})", "green"))
 
 
+@decorators.timed
 def assign_teacher():
     clear()
     header("O'QITUVCHI TAYINLASH")
@@ -201,7 +215,7 @@ def assign_teacher():
         print(colored("\n❌ Fan topilmadi", "red"))
         return
 
-    teachers = [u for u in list_users() if u.get("role") == "Teacher"]
+    teachers = list_users_by_role("Teacher")
     if not teachers:
         print(colored("\n❌ O'qituvchilar yo'q", "red"))
         return
@@ -218,16 +232,18 @@ def assign_teacher():
         print(colored("\n❌ Topilmadi", "red"))
         return
 
-    update_subject(code, {"teacher": teacher_name})
+    with transaction():
+        update_subject(code, {"teacher": teacher_name})
 
-    teacher_subjects = teacher_rec.get("subjects", [])
-    if code not in teacher_subjects:
-        teacher_subjects.append(code)
-        update_user(teacher_name, {"subjects": teacher_subjects})
+        teacher_subjects = teacher_rec.get("subjects", [])
+        if code not in teacher_subjects:
+            teacher_subjects.append(code)
+            update_user(teacher_name, {"subjects": teacher_subjects})
 
     print(colored(f"\n✓ {teacher_name} -> {subject['name']}", "green"))
 
 
+@decorators.timed
 def enroll_student():
     clear()
     header("TALABA YOZISH")
@@ -249,7 +265,7 @@ def enroll_student():
         print(colored("\n❌ Fan topilmadi", "red"))
         return
 
-    students = [u for u in list_users() if u.get("role") == "Student"]
+    students = list_users_by_role("Student")
     if not students:
         print(colored("\n❌ Talabalar yo'q", "red"))
         return
@@ -265,17 +281,16 @@ def enroll_student():
         print(colored("\n❌ Topilmadi", "red"))
         return
 
-    enrolled = subject.get("students", [])
-    if student_name in enrolled:
+    if student_name in subject.get("students", []):
         print(colored("\n❌ Allaqachon yozilgan", "yellow"))
         return
 
-    enrolled.append(student_name)
-    update_subject(code, {"students": enrolled})
+    enroll(code, [student_name])
 
     print(colored(f"\n✓ {student_name} -> {subject['name']}", "green"))
 
 
+@decorators.timed
 def view_all_subjects():
     clear()
     header("FANLAR")
@@ -288,6 +303,9 @@ def view_all_subjects():
     for s in subjects:
         print(colored(f"\n📚 {s['name']} [{s['code']}]", "cyan", attrs=["bold"]))
         print(colored(f"   O'qituvchi: {s.get('teacher', 'Yo\'q')}", "white"))
+        total, count = s.get("grade_total") or (0, 0)
+        if count:
+            print(colored(f"   O'rtacha: {total / count:.2f} ({count} baho)", "white"))
         students = s.get("students", [])
         print(
             colored(
@@ -297,6 +315,7 @@ def view_all_subjects():
         )
 
 
+@decorators.timed
 def remove_user():
     clear()
     header("USER O'CHIRISH")
@@ -322,6 +341,7 @@ def remove_user():
         print(colored("\n↩ Bekor qilindi", "yellow"))
 
 
+@decorators.timed
 def reset_password():
     clear()
     header("PAROL")
@@ -340,16 +360,142 @@ def reset_password():
         print(colored("\n❌ Xato", "red"))
 
 
-def view_logs():
+@decorators.timed
+def close_current_term():
     clear()
-    header("LOGLAR")
+    header("SEMESTRNI YOPISH")
 
-    if os.path.exists("data.log"):
-        with open("data.log", encoding="utf-8") as f:
-            logs = f.read()
-            print(colored(logs if logs.strip() else "Bo'sh", "white"))
-    else:
+    terms = list_terms()
+    if terms:
+        print(colored("Arxivdagi semestrlar:", "cyan"))
+        for term in terms:
+            print(colored(f"   • {term['name']} ({term['closed']})", "white"))
+        print()
+
+    name = input(colored("Semestr nomi (masalan 2024-kuz): ", "cyan")).strip()
+    confirm = (
+        input(
+            colored(
+                f"\nJoriy baho va davomat '{name}' arxiviga ko'chirilsinmi?"
+                " (ha/yo'q): ",
+                "yellow",
+            )
+        )
+        .strip()
+        .lower()
+    )
+    if confirm != "ha":
+        print(colored("\n↩ Bekor qilindi", "yellow"))
+        return
+
+    try:
+        result = close_term(name)
+    except ValueError as e:
+        print(colored(f"\n❌ {e}", "red"))
+        return
+
+    print(
+        colored(
+            f"\n✓ Arxivlandi: {result['students']} talaba, {result['subjects']} fan",
+            "green",
+        )
+    )
+
+
+@decorators.timed
+def view_logs():
+    import logview
+
+    if not logview.segment_paths():
+        clear()
+        header("LOGLAR")
         print(colored("Loglar yo'q", "yellow"))
+        return
+
+    user = action = None
+    history = []
+    position = None
+
+    with logview.LogView() as view:
+        while True:
+            if user or action:
+                lines, start = view.search(user, action, position, logview.PAGE_SIZE)
+            else:
+                lines, start = view.page_before(position, logview.PAGE_SIZE)
+
+            clear()
+            header("LOGLAR")
+            if user or action:
+                shown = f"user={user or '*'} amal={action or '*'}"
+                print(colored(f"Filtr: {shown}", "cyan"))
+            shown = "\n".join(logview.display_line(line) for line in lines)
+            print(colored(shown or "Bo'sh", "white"))
+            print(
+                colored(
+                    "\n[e] eskiroq  [y] yangiroq  [f] filtr  [t] tozalash  [q] chiqish",
+                    "cyan",
+                )
+            )
+
+            match input(colored("> ", "cyan")).strip().lower():
+                case "e":
+                    if lines and start > 0:
+                        history.append(position)
+                        position = start
+                case "y":
+                    if history:
+                        position = history.pop()
+                case "f":
+                    user = input(colored("User (bo'sh = hammasi): ", "cyan")).strip()
+                    action = input(colored("Amal (bo'sh = hammasi): ", "cyan")).strip()
+                    user, action = user or None, action or None
+                    history, position = [], None
+                case "t":
+                    user = action = None
+                    history, position = [], None
+                case "q" | "":
+                    return
+
+
+def view_metrics():
+    clear()
+    header("METRIKALAR")
+
+    result = metrics.report()
+    if not result["actions"]:
+        print(colored("Hali o'lchovlar yo'q", "yellow"))
+
+    for name, stats in result["actions"].items():
+        wall, cpu = stats["wall_ms"], stats["cpu_ms"]
+        io = stats["storage_per_call"]
+        print(colored(f"\n⏱ {name} ({stats['calls']} marta)", "cyan"))
+        print(
+            colored(
+                f"   p50/p95/p99: {wall['p50']:.1f} / {wall['p95']:.1f}"
+                f" / {wall['p99']:.1f} ms  (CPU p95: {cpu['p95']:.1f} ms)",
+                "white",
+            )
+        )
+        print(
+            colored(
+                f"   Har chaqiruvda: {io['disk_reads']:.1f} o'qish,"
+                f" {io['disk_writes']:.1f} yozish,"
+                f" {io['bytes_read'] / 1024:.1f} KB o'qildi,"
+                f" {io['bytes_written'] / 1024:.1f} KB yozildi",
+                "white",
+            )
+        )
+
+    counters = result["counters"]
+    print(colored("\nSaqlash:", "cyan"))
+    for name in metrics.IO_COUNTERS:
+        print(colored(f"   {name}: {counters.get(name, 0):g}", "white"))
+
+    answer = input(colored("\nFaylga saqlash? (ha/yo'q): ", "yellow")).strip().lower()
+    if answer == "ha":
+        filename = f"metrics_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+        metrics.dump(filename)
+        print(colored(f"\n✓ Saqlandi: {filename}", "green"))
 
 
 @decorators.require_role("Teacher")
@@ -360,6 +506,8 @@ def teacher_menu(teacher: Teacher):
         "2": lambda: add_attendance(teacher),
         "3": lambda: add_grade(teacher),
         "4": lambda: subject_analysis(teacher),
+        "5": lambda: import_grades(teacher),
+        "6": lambda: take_roll_call(teacher),
     }
 
     while True:
@@ -369,12 +517,14 @@ def teacher_menu(teacher: Teacher):
         print(colored("2. Davomat", "cyan"))
         print(colored("3. Baho", "cyan"))
         print(colored("4. Tahlil", "cyan"))
-        print(colored("5. Chiqish", "cyan"))
+        print(colored("5. Baholarni import (CSV)", "cyan"))
+        print(colored("6. Yo'qlama (butun guruh)", "cyan"))
+        print(colored("7. Chiqish", "cyan"))
 
         choice = input(colored("\n> ", "cyan")).strip()
 
         match choice:
-            case "5":
+            case "7":
                 session.current_user = None
                 break
             case _ if choice in actions:
@@ -385,6 +535,7 @@ def teacher_menu(teacher: Teacher):
                 time.sleep(1)
 
 
+@decorators.timed
 def my_subjects(teacher: Teacher):
     clear()
     header("MENING FANLARIM")
@@ -406,6 +557,7 @@ def my_subjects(teacher: Teacher):
                 print(colored("     Yo'q", "yellow"))
 
 
+@decorators.timed
 def add_attendance(teacher: Teacher):
     clear()
     header("DAVOMAT")
@@ -446,14 +598,75 @@ def add_attendance(teacher: Teacher):
         print(colored("\n❌ Bu talaba bu fanda emas", "red"))
         return
 
-    rec = find_user(sname)
-    student = instantiate_user_from_record(rec)
-    teacher.record_attendance(student, code)
-    update_user(sname, {"attendance": student._attendance})
+    roll_call(code, datetime.date.today().isoformat(), [sname], [])
 
     print(colored(f"\n✓ Davomat yozildi", "green"))
 
 
+@decorators.timed
+def take_roll_call(teacher: Teacher):
+    clear()
+    header("YO'QLAMA")
+
+    if not teacher.subjects:
+        print(colored("❌ Sizga fan tayinlanmagan", "yellow"))
+        return
+
+    print(colored("Fanlaringiz:", "cyan"))
+    for code in teacher.subjects:
+        subject = find_subject(code)
+        if subject:
+            print(colored(f"  [{code}] {subject['name']}", "white"))
+
+    code = input(colored("\nFan: ", "cyan")).strip().upper()
+
+    if code not in teacher.subjects:
+        print(colored("\n❌ Bu fan sizga tegishli emas", "red"))
+        return
+
+    subject = find_subject(code)
+    if not subject:
+        print(colored("\n❌ Fan topilmadi", "red"))
+        return
+
+    records = (find_user(name) for name in subject.get("students", []))
+    students = [
+        instantiate_user_from_record(rec, subjects=[code], fields=("attendance",))
+        for rec in records
+        if rec
+    ]
+    if not students:
+        print(colored("\n❌ Talabalar yo'q", "red"))
+        return
+
+    date_str = input(colored("Sana (YYYY-MM-DD, bo'sh = bugun): ", "cyan")).strip()
+    if date_str:
+        try:
+            date_str = datetime.date.fromisoformat(date_str).isoformat()
+        except ValueError:
+            print(colored("\n❌ Noto'g'ri sana", "red"))
+            return
+
+    print(colored("\nKeldi: Enter, kelmadi: -", "cyan"))
+    present = set()
+    for student in students:
+        mark = input(colored(f"  {student.username}: ", "white")).strip()
+        if mark != "-":
+            present.add(student.username)
+
+    marks = teacher.roll_call(students, code, present, date_str or None)
+    roll_call(code, marks["date"], marks["present"], marks["absent"])
+
+    print(
+        colored(
+            f"\n✓ Yo'qlama {marks['date']}: {len(marks['present'])} keldi,"
+            f" {len(marks['absent'])} kelmadi ({marks['changed']} o'zgardi)",
+            "green",
+        )
+    )
+
+
+@decorators.timed
 def add_grade(teacher: Teacher):
     clear()
     header("BAHO")
@@ -495,7 +708,7 @@ def add_grade(teacher: Teacher):
         return
 
     rec = find_user(sname)
-    student = instantiate_user_from_record(rec)
+    student = instantiate_user_from_record(rec, subjects=[code], fields=("grades",))
 
     task = input(colored("Vazifa: ", "cyan")).strip()
 
@@ -508,11 +721,12 @@ def add_grade(teacher: Teacher):
         return
 
     teacher.record_grade(student, code, task, grade)
-    update_user(sname, {"grades": student._grades})
+    set_grade(sname, code, task, grade)
 
     print(colored(f"\n✓ Baho yozildi: {task} = {grade}", "green"))
 
 
+@decorators.timed
 def subject_analysis(teacher: Teacher):
     clear()
     header("TAHLIL")
@@ -543,10 +757,11 @@ def subject_analysis(teacher: Teacher):
         print(colored("\n❌ Talabalar yo'q", "red"))
         return
 
+    records = (find_user(name) for name in student_names)
     students = [
-        instantiate_user_from_record(find_user(name))
-        for name in student_names
-        if find_user(name)
+        instantiate_user_from_record(rec, subjects=[code], fields=("grades",))
+        for rec in records
+        if rec
     ]
 
     result = teacher.analyze_subject(students, code)
@@ -564,16 +779,70 @@ def subject_analysis(teacher: Teacher):
     else:
         print(colored("📊 Median: N/A", "yellow"))
 
-    with open(f"report_{code}.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Metric", "Value"])
-        writer.writerow(["Fan", subject["name"]])
-        writer.writerow(["Kod", code])
-        writer.writerow(["Talabalar", result.get("students_count")])
-        writer.writerow(["O'rtacha", result.get("subject_mean")])
-        writer.writerow(["Median", result.get("subject_median")])
+    if result.get("grades_count"):
+        low, high = result["subject_min"], result["subject_max"]
+        print(
+            colored(
+                f"📉 Min/Max: {low:.2f} / {high:.2f}"
+                f"  Std: {result['subject_stdev']:.2f}",
+                "cyan",
+            )
+        )
+        print(colored("\nVazifalar bo'yicha o'rtacha:", "cyan"))
+        for task, avg in result["assignment_means"].items():
+            print(colored(f"   • {task}: {avg:.2f}", "white"))
+        print(colored("\nBaholar taqsimoti:", "cyan"))
+        for band, count in result["histogram"].items():
+            print(colored(f"   {band:>6}: {count}", "white"))
+
+    import reports
+
+    filename = reports.subject_report_name(code)
+    reports.write_report(filename, reports.render_subject_report(subject, result))
+
+    print(colored(f"\n✓ Saqlandi: {filename}", "green"))
+
+
+@decorators.timed
+def import_grades(teacher: Teacher):
+    clear()
+    header("BAHOLARNI IMPORT")
+
+    if not teacher.subjects:
+        print(colored("❌ Sizga fan tayinlanmagan", "yellow"))
+        return
+
+    code = input(colored("Fan: ", "cyan")).strip().upper()
+
+    if code not in teacher.subjects:
+        print(colored("\n❌ Bu fan sizga tegishli emas", "red"))
+        return
+
+    path = input(colored("CSV fayl (talaba,vazifa,baho): ", "cyan")).strip()
+    if not os.path.exists(path):
+        print(colored("\n❌ Fayl topilmadi", "red"))
+        return
+
+    import bulk
+
+    try:
+        result = bulk.import_grades(code, path)
+    except ValueError as e:
+        print(colored(f"\n❌ {e}", "red"))
+        return
 
-    print(colored(f"\n✓ Saqlandi: report_{code}.csv", "green"))
+    print(
+        colored(
+            f"\n✓ Yozildi: {result['applied']} baho, {result['students']} talaba",
+            "green",
+        )
+    )
+    if result["errors"]:
+        for line_no, message in result["errors"][:20]:
+            print(colored(f"   {line_no}-qator: {message}", "yellow"))
+        report = f"import_errors_{code}.csv"
+        bulk.write_error_report(result["errors"], report)
+        print(colored(f"❌ Xatolar: {len(result['errors'])} ta -> {report}", "red"))
 
 
 @decorators.require_role("Student")
@@ -583,6 +852,7 @@ def student_menu(student: Student):
         "1": lambda: show_progress(student),
         "2": lambda: show_attendance(student),
         "3": lambda: export_report(student),
+        "4": lambda: show_transcript(student),
     }
 
     while True:
@@ -591,12 +861,13 @@ def student_menu(student: Student):
         print(colored("1. Baholar", "cyan"))
         print(colored("2. Davomat", "cyan"))
         print(colored("3. Eksport", "cyan"))
-        print(colored("4. Chiqish", "cyan"))
+        print(colored("4. Transkript", "cyan"))
+        print(colored("5. Chiqish", "cyan"))
 
         choice = input(colored("\n> ", "cyan")).strip()
 
         match choice:
-            case "4":
+            case "5":
                 session.current_user = None
                 break
             case _ if choice in actions:
@@ -607,6 +878,7 @@ def student_menu(student: Student):
                 time.sleep(1)
 
 
+@decorators.timed
 def show_progress(student: Student):
     clear()
     header("BAHOLAR")
@@ -631,7 +903,7 @@ def show_progress(student: Student):
         print(colored(f"📚 {subject_name} [{subject_code}]", "cyan"))
 
         if subject_grades:
-            subject_avg = statistics.mean(subject_grades.values())
+            subject_avg = student.average_by_subject(subject_code)
             print(colored(f"   O'rtacha: {subject_avg:.2f}", "white"))
             for task, grade in subject_grades.items():
                 print(colored(f"   • {task}: {grade}", "white"))
@@ -640,6 +912,7 @@ def show_progress(student: Student):
         print()
 
 
+@decorators.timed
 def show_attendance(student: Student):
     clear()
     header("DAVOMAT")
@@ -661,37 +934,43 @@ def show_attendance(student: Student):
             print(colored(f"   • {date}", "white"))
 
 
+@decorators.timed
 def export_report(student: Student):
     clear()
     header("EKSPORT")
 
-    filename = f"report_{student.username}.txt"
-
-    with open(filename, "w") as f:
-        f.write("=" * 50 + "\n")
-        f.write("TALABA HISOBOTI\n")
-        f.write("=" * 50 + "\n\n")
-        f.write(f"Talaba: {student.username}\n")
-        f.write(f"Umumiy o'rtacha: {student.overall_average or 'N/A'}\n\n")
-
-        f.write("BAHOLAR:\n" + "-" * 50 + "\n")
-
-        if student.grades:
-            for subject_code, subject_grades in student.grades.items():
-                subject = find_subject(subject_code)
-                subject_name = subject["name"] if subject else subject_code
-                f.write(f"\n{subject_name} [{subject_code}]:\n")
-
-                if subject_grades:
-                    subject_avg = statistics.mean(subject_grades.values())
-                    f.write(f"  O'rtacha: {subject_avg:.2f}\n")
-                    for task, grade in subject_grades.items():
-                        f.write(f"  {task}: {grade}\n")
-                else:
-                    f.write("  Baholar yo'q\n")
-        else:
-            f.write("Yo'q\n")
+    import reports
+
+    filename = reports.student_report_name(student.username)
+    subject_names = {}
+    for code in student.grades:
+        subject = find_subject(code)
+        if subject:
+            subject_names[code] = subject["name"]
+    reports.write_report(
+        filename, reports.render_student_report(student, subject_names)
+    )
+
+    print(colored(f"✓ Saqlandi: {filename}", "green"))
+
+
+@decorators.timed
+def show_transcript(student: Student):
+    clear()
+    header("TRANSKRIPT")
 
-        f.write("\n" + "=" * 50 + "\n")
+    import reports
+
+    subject_names = {}
+    for code in list(student.grades) + list(student.attendance):
+        subject = find_subject(code)
+        if subject:
+            subject_names[code] = subject["name"]
+    text = reports.render_transcript(
+        student, subject_names, transcript(student.username)
+    )
+    print(text)
 
+    filename = reports.transcript_name(student.username)
+    reports.write_report(filename, text)
     print(colored(f"✓ Saqlandi: {filename}", "green"))